@@ -0,0 +1,250 @@
+"""
+Benchmarks of the plugin's own overhead.
+
+- collect    - collecting a generated chaos file of 1, 100 and 10k actors
+- wrapper    - per-call cost of the injected wrappers and histogram recording,
+               next to a plain call
+- patch      - preparing an act's patches, applying and reverting them
+- transition - time the app spends blocked in next-point between two acts,
+               patching per act and with --chaos-dispatch
+
+Results can be saved as JSON and compared with an earlier run, every
+benchmark slower than the threshold is flagged as a regression.
+
+Usage:
+    python benchmarks/bench.py [--only NAME ...] [--save PATH] [--compare PATH] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import pytest
+from _pytest import monkeypatch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import synthetic_app
+from chaos_test.histogram import Slot, timed_factory
+from chaos_test.isolation import IsolatedStage
+from chaos_test.structure import ActorStats, Scenario, delay_factory, raise_factory
+
+ACTOR_COUNTS = (1, 100, 10000)
+TRANSITION_ACTS = 40
+
+
+class BenchScenario(Scenario):
+    """
+    Scenario without pytest nodes - acts are built, activated and undone directly.
+    """
+    def __init__(self, acts):
+        super(BenchScenario, self).__init__(None, synthetic_app.factory, monkeypatch, acts,
+                                            global_next="synthetic_app.advance")
+
+    def create_act(self, name, act_info, last):
+        return IsolatedStage(name, self, act_info, last)
+
+
+def actors(count):
+    synthetic_app.make_targets(count)
+    return dict(
+        ("synthetic_app." + synthetic_app.target_name(index), [{"exc": "KeyError"}])
+        for index in range(count)
+    )
+
+
+def write_scenario(directory, acts, actor_count):
+    lines = [
+        'entry-point="synthetic_app.factory"',
+        'next-point="synthetic_app.advance"',
+    ]
+    synthetic_app.make_targets(actor_count)
+    for _ in range(acts):
+        lines.append('[[act]]')
+        lines.append('[[act."synthetic_app.fail"]]')
+        lines.append('exc="KeyError"')
+        for index in range(actor_count):
+            lines.append('[[act."synthetic_app.{}"]]'.format(synthetic_app.target_name(index)))
+            lines.append('exc="KeyError"')
+    path = os.path.join(directory, "chaos_bench_{}_{}.toml".format(acts, actor_count))
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+    return path
+
+
+def run_pytest(args):
+    """
+    Run pytest in this process with its output discarded.
+    """
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            return pytest.main(args + ["-q", "-p", "no:cacheprovider"])
+        finally:
+            sys.stdout = stdout
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        function()
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def per_call(function, number=100000, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def bench_collect(results, directory):
+    for count in ACTOR_COUNTS:
+        path = write_scenario(directory, 1, count)
+        repeat = 1 if count >= 10000 else 3
+        results["collect.{}_actors".format(count)] = best_of(
+            lambda: run_pytest([path, "--collect-only"]), repeat)
+
+
+def bench_wrapper(results, directory):
+    def original():
+        pass
+
+    def raising():
+        try:
+            raise_call()
+        except KeyError:
+            pass
+
+    passthrough = raise_factory(KeyError, (), ActorStats(), original, lambda: False)
+    raise_call = raise_factory(KeyError, (), ActorStats())
+    delay = delay_factory(lambda: 0, ActorStats(), original)
+    results["wrapper.plain_call"] = per_call(original)
+    results["wrapper.raise_passthrough"] = per_call(passthrough)
+    results["wrapper.raise"] = per_call(raising)
+    results["wrapper.delay_zero"] = per_call(delay, number=10000)
+    results["wrapper.histogram"] = per_call(timed_factory(original, Slot()))
+
+
+def bench_patch(results, directory):
+    for count in ACTOR_COUNTS:
+        scenario = BenchScenario([actors(count)])
+        stage = scenario.acts[0]
+        # Resolve targets up front, preparation is measured on its own.
+        stage.prepare()
+        repeat = 3 if count >= 10000 else 20
+        timings = [prepare_apply_revert(stage) for _ in range(repeat)]
+        for index, phase in enumerate(("prepare", "apply", "revert")):
+            results["patch.{}_{}_actors".format(phase, count)] = min(timing[index] for timing in timings)
+
+
+def prepare_apply_revert(stage):
+    start = timeit.default_timer()
+    stage.prepare()
+    prepared = timeit.default_timer()
+    stage.activate()
+    applied = timeit.default_timer()
+    stage.deactivate()
+    return prepared - start, applied - prepared, timeit.default_timer() - applied
+
+
+def bench_transition(results, directory):
+    path = write_scenario(directory, TRANSITION_ACTS, 0)
+    for mode, options in (("", []), ("dispatch_", ["--chaos-dispatch"])):
+        del synthetic_app.LATENCIES[:]
+        run_pytest([path] + options)
+        latencies = sorted(synthetic_app.LATENCIES)
+        if latencies:
+            results["transition.{}median".format(mode)] = latencies[len(latencies) // 2]
+            results["transition.{}max".format(mode)] = latencies[-1]
+
+
+BENCHMARKS = [
+    ("collect", bench_collect),
+    ("wrapper", bench_wrapper),
+    ("patch", bench_patch),
+    ("transition", bench_transition),
+]
+
+
+def run(only=None):
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for name, benchmark in BENCHMARKS:
+            if not only or name in only:
+                benchmark(results, directory)
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Lines comparing `results` with `baseline`, and whether any benchmark regressed.
+    """
+    lines = []
+    regressed = False
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name] if baseline[name] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        lines.append("{:<32} {:>12} {:>12} {:>7.2f}x{}".format(
+            name, format_time(baseline[name]), format_time(results[name]), ratio, flag))
+    return lines, regressed
+
+
+def format_time(seconds):
+    if seconds >= 1:
+        return "{:.3f}s".format(seconds)
+    if seconds >= 1e-3:
+        return "{:.3f}ms".format(seconds * 1e3)
+    return "{:.3f}us".format(seconds * 1e6)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chaos_test plugin's overhead.")
+    parser.add_argument("--only", nargs="+", choices=[name for name, _ in BENCHMARKS],
+                        help="Run only these benchmarks.")
+    parser.add_argument("--save", metavar="PATH", help="Store results as JSON.")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with results stored earlier.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown flagged as a regression (default 0.2).")
+    args = parser.parse_args(argv)
+
+    results = run(args.only)
+    for name in sorted(results):
+        print("{:<32} {:>12}".format(name, format_time(results[name])))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.time(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        lines, regressed = compare(results, baseline, args.threshold)
+        print("")
+        print("{:<32} {:>12} {:>12} {:>8}".format("benchmark", "baseline", "current", "ratio"))
+        print("\n".join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Synthetic application used by the benchmarks.
+
+Every loop iteration calls ``advance`` which is used as the next-point, so the
+time spent inside it is the latency of a single act transition. ``make_targets``
+adds as many no-op functions as a benchmark needs actors.
+"""
+import sys
+import time
+
+LATENCIES = []
+
+
+def fail():
+    pass
+
+
+def advance():
+    pass
+
+
+def target_name(index):
+    return "target_{}".format(index)
+
+
+def make_targets(count):
+    """
+    Make sure functions target_0 ... target_{count - 1} exist in this module.
+    """
+    module = sys.modules[__name__]
+    for index in range(count):
+        name = target_name(index)
+        if not hasattr(module, name):
+            setattr(module, name, lambda: None)
+
+
+def main():
+    while True:
+        try:
+            fail()
+        except KeyError:
+            pass
+        start = time.time()
+        advance()
+        LATENCIES.append(time.time() - start)
+
+
+def factory():
+    return main
@@ -1 +1,2 @@
-from .parser import TomlChaosFile, YamlChaosFile
+from .parser import (ChaosFile, JsonChaosFile, JsonLinesChaosFile, TomlChaosFile, YamlChaosFile,
+                     register_format)
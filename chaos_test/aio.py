@@ -0,0 +1,208 @@
+"""
+Asyncio support - coroutine entry points and coroutine targets.
+
+A coroutine entry point runs on its own event loop inside the application
+thread. Coroutine targets get coroutine wrappers, so patching keeps their
+semantics, and a coroutine next-point waits for the act transition on an
+asyncio.Event instead of blocking the loop.
+"""
+import asyncio
+import inspect
+import sys
+import threading
+import time
+
+ALL_TASKS = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+CLOCK = time.perf_counter
+
+
+def is_coroutine(obj):
+    return inspect.iscoroutinefunction(obj) or inspect.iscoroutine(obj)
+
+
+def run(main):
+    """
+    Run coroutine (function) `main` to completion on a new event loop.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(main() if inspect.iscoroutinefunction(main) else main)
+    finally:
+        pending = [task for task in ALL_TASKS(loop) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+
+class Handoff(object):
+    """
+    Event the runner thread sets once the next act is active, awaited on the app's loop.
+    """
+    def __init__(self):
+        self.loop = asyncio.get_event_loop()
+        self.event = asyncio.Event()
+
+    def set(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    def wait(self):
+        return self.event.wait()
+
+
+def raise_factory(exc, message, stats, original=None, trigger=None, gate=None):
+    async def raise_exception(*args, **kwargs):
+        if gate is not None and not gate.active:
+            return await original(*args, **kwargs)
+        stats.calls += 1
+        start = CLOCK()
+        try:
+            if trigger is not None and not trigger():
+                return await original(*args, **kwargs)
+            stats.hits += 1
+            if stats.first_hit is None:
+                stats.first_hit = start
+            raise exc(*message)
+        finally:
+            stats.elapsed += CLOCK() - start
+    return raise_exception
+
+
+def delay_factory(sample, stats, original, call_original=True, trigger=None, gate=None):
+    async def delay(*args, **kwargs):
+        if gate is not None and not gate.active:
+            return await original(*args, **kwargs)
+        stats.calls += 1
+        start = CLOCK()
+        try:
+            if trigger is None or trigger():
+                stats.hits += 1
+                pause = sample()
+                stats.delayed += pause
+                await asyncio.sleep(pause)
+            if call_original:
+                return await original(*args, **kwargs)
+        finally:
+            stats.elapsed += CLOCK() - start
+    return delay
+
+
+def count_factory(original, stats):
+    async def count(*args, **kwargs):
+        stats.calls += 1
+        return await original(*args, **kwargs)
+    return count
+
+
+def trampoline_factory(original, behaviors, cursor):
+    async def trampoline(*args, **kwargs):
+        behavior = behaviors[cursor.index]
+        if behavior is None:
+            return await original(*args, **kwargs)
+        return await behavior(*args, **kwargs)
+    return trampoline
+
+
+def select_factory(wrapper, original, matches):
+    async def select(instance, *args, **kwargs):
+        if matches(instance):
+            return await wrapper(instance, *args, **kwargs)
+        return await original(instance, *args, **kwargs)
+    return select
+
+
+def next_factory(next_method, act, channel, stats, gate=None):
+    # Tasks reaching the next-point during the act all await the one transition -
+    # a handoff per event loop, the runner drops the NEXTs of all but the first.
+    lock = threading.Lock()
+    pending = {}
+
+    async def next_act(*args, **kwargs):
+        if gate is not None and not gate.active:
+            return await next_method(*args, **kwargs)
+        stats.calls += 1
+        stats.hits += 1
+        if stats.first_hit is None:
+            stats.first_hit = CLOCK()
+        loop = asyncio.get_event_loop()
+        with lock:
+            handoff = pending.get(loop)
+            first = handoff is None
+            if first:
+                handoff = pending[loop] = Handoff()
+        if first:
+            channel.put(
+                {
+                    "COMMAND": "NEXT",
+                    "ACT": act.name,
+                    "HANDOFF": handoff
+                }
+            )
+        # Other tasks keep running while the runner swaps the patches.
+        await handoff.wait()
+        return await next_method(*args, **kwargs)
+    return next_act
+
+
+def last_factory(act, channel, stats, original=None, gate=None):
+    async def next_act(*args, **kwargs):
+        if gate is not None and not gate.active:
+            return await original(*args, **kwargs)
+        stats.calls += 1
+        stats.hits += 1
+        if stats.first_hit is None:
+            stats.first_hit = CLOCK()
+        channel.put(
+            {
+                "COMMAND": "NEXT",
+                "ACT": act.name
+            }
+        )
+        sys.exit(0)
+    return next_act
+
+
+async def load_workers(generator):
+    """
+    `generator.concurrency` workers calling a coroutine load target until it is stopped.
+    """
+    await asyncio.gather(*[load_worker(generator) for _ in range(generator.concurrency)])
+
+
+async def load_worker(generator):
+    while not generator.stopped.is_set():
+        if generator.pacer is not None:
+            wait = generator.pacer.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                if generator.stopped.is_set():
+                    break
+        start = CLOCK()
+        try:
+            await generator.target()
+            success = True
+        except Exception:
+            success = False
+        generator.record(CLOCK() - start, success)
+
+
+def timed_factory(original, slot):
+    async def timed(*args, **kwargs):
+        # Counted in the phase the call started in.
+        histogram = slot.histogram
+        start = CLOCK()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            histogram.record(CLOCK() - start)
+    return timed
+
+
+def stop_factory(original, thread):
+    async def stop(*args, **kwargs):
+        if threading.current_thread() is thread:
+            sys.exit(0)
+        return await original(*args, **kwargs)
+    return stop
@@ -0,0 +1,142 @@
+"""
+Baseline runs - how the application does without chaos, to compare acts with.
+
+With --chaos-baseline the application runs unpatched before the first act -
+after the scenario's `warm-up`, if any - for `iterations` measurement windows.
+A window lasts `duration` seconds, or until the next-point was called `calls`
+times. The scenario `timeout` bounds the whole baseline - a window that can't
+finish in time fails the scenario. The baseline is the median of the windows:
+
+    throughput - iterations per second, counted by the iteration-point
+    latency - p50 and p99 of every target with a histogram, and of the load
+
+Every act then reports its own numbers as ratios of the baseline's.
+"""
+import time
+
+LATENCIES = ("p50", "p99")
+POLL_INTERVAL = 0.001
+
+
+class Baseline(object):
+    """
+    Measurement of the application before the first act.
+    """
+    def __init__(self, spec=None):
+        spec = spec or {}
+        assert isinstance(spec, dict), "baseline is a table with a duration or calls, and iterations."
+        self.duration = spec.get("duration")
+        self.calls = spec.get("calls")
+        self.iterations = spec.get("iterations", 1)
+        assert self.duration is None or self.calls is None, "baseline lasts a duration or a number of calls, not both."
+        if self.calls is None and self.duration is None:
+            self.duration = 1
+        if self.duration is not None:
+            assert isinstance(self.duration, (int, float)) and self.duration > 0, \
+                "baseline duration has to be a positive number of seconds."
+        if self.calls is not None:
+            assert isinstance(self.calls, int) and self.calls > 0, \
+                "baseline calls has to be a positive number of next-point calls."
+        assert isinstance(self.iterations, int) and self.iterations > 0, \
+            "baseline iterations has to be a positive integer."
+        self.windows = []
+        self.summary = None
+
+    def measure(self, scenario, thread, deadline=None):
+        """
+        Run the measurement windows while the unpatched application runs in `thread`.
+        deadline - time.time() all windows have to be over by, None to wait for them
+        """
+        for index in range(self.iterations):
+            if not thread.is_alive():
+                break
+            self.windows.append(self.window(scenario, thread, "baseline-{}".format(index), deadline))
+        self.summary = self.summarize()
+
+    def window(self, scenario, thread, phase, deadline=None):
+        if scenario.histograms is not None:
+            scenario.histograms.switch(phase)
+        if scenario.load is not None:
+            scenario.load.switch(phase)
+        iterations_at = scenario.iterations.calls
+        calls_at = scenario.next_calls.calls
+        started_at = time.time()
+        if self.calls is None:
+            limit = self.duration if deadline is None else min(self.duration, deadline - started_at)
+            thread.join(max(limit, 0))
+            finished = time.time() - started_at >= self.duration
+        else:
+            finished = False
+            while thread.is_alive() and (deadline is None or time.time() < deadline):
+                if scenario.next_calls.calls - calls_at >= self.calls:
+                    finished = True
+                    break
+                time.sleep(POLL_INTERVAL)
+        # An application that exited ends the baseline early, one too slow fails it.
+        assert finished or not thread.is_alive(), \
+            "Baseline window {} did not finish before the scenario timeout.".format(phase)
+        duration = time.time() - started_at
+        window = {
+            "duration": duration,
+            "throughput": None,
+            "latency": {},
+        }
+        if scenario.iteration_point and duration > 0:
+            window["throughput"] = (scenario.iterations.calls - iterations_at) / duration
+        if scenario.histograms is not None:
+            window["latency"].update(scenario.histograms.summary(phase))
+        if scenario.load is not None:
+            load = scenario.load.collect(phase)
+            if load and load["requests"]:
+                window["latency"]["load"] = load
+        return window
+
+    def summarize(self):
+        if not self.windows:
+            return None
+        summary = {
+            "windows": len(self.windows),
+            "throughput": median([window["throughput"] for window in self.windows]),
+            "latency": {},
+        }
+        for target in self.windows[-1]["latency"]:
+            summary["latency"][target] = dict(
+                (name, median([window["latency"].get(target, {}).get(name) for window in self.windows]))
+                for name in LATENCIES
+            )
+        return summary
+
+    def ratios(self, metrics):
+        """
+        Act's throughput and latencies as ratios of the baseline, None where either is unknown.
+        """
+        if self.summary is None:
+            return None
+        ratios = {
+            "throughput": ratio(metrics.get("throughput"), self.summary["throughput"]),
+            "latency": {},
+        }
+        current = dict(metrics.get("histograms") or {})
+        if metrics.get("load"):
+            current["load"] = metrics["load"]
+        for target, baseline in self.summary["latency"].items():
+            latency = current.get(target) or {}
+            ratios["latency"][target] = dict(
+                (name, ratio(latency.get(name), baseline[name])) for name in LATENCIES)
+        return ratios
+
+
+def median(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def ratio(value, baseline):
+    if value is None or not baseline:
+        return None
+    return value / float(baseline)
@@ -0,0 +1,82 @@
+"""
+Compiled scenario cache.
+
+Parsing and validating a chaos file produces a compiled scenario - a plain
+dict holding everything a Scenario is built from. It is stored in pytest's
+cache, keyed by the file path, so unchanged files skip parsing and
+scenario level validation on later runs. A file is unchanged if its mtime
+and size match, or, failing that, the hash of its content.
+
+Acts are cached as parsed. Their settings and actors are still validated
+when the acts are built, at every collection, cached or not.
+"""
+import hashlib
+import os
+
+CACHE_PREFIX = "chaos_test/compiled/"
+# Bump whenever the compiled form changes - new header keys invalidate entries on their own.
+CACHE_VERSION = 6
+# Top level keys of a scenario file kept in its compiled form, next to its acts.
+HEADER_KEYS = ("entry-point", "next-point", "timeout", "iteration-point", "generate", "load",
+               "histograms", "warm-up", "baseline")
+
+
+def compile_scenario(raw, extract_acts):
+    """
+    Validate parsed chaos file and reduce it to its compiled form.
+    """
+    raw = raw or {}
+    entry_point = raw.get('entry-point')
+    global_next = raw.get('next-point')
+    assert entry_point is not None, "Define entry point to run chaos testing."
+
+    acts = extract_acts(raw)
+    for act in acts:
+        assert isinstance(act, dict), "Every act has to be a mapping of actors."
+        assert act.get('next-point') or global_next, \
+            "Without global next-point, there needs to be one defined per scenario."
+    compiled = dict((key, raw.get(key)) for key in HEADER_KEYS)
+    compiled["acts"] = acts
+    return compiled
+
+
+def load_scenario(config, path, parse, extract_acts):
+    """
+    Compiled scenario of the file at `path`, from the cache if the file didn't change.
+    parse - turns file content (bytes) into a dict.
+    """
+    path = os.path.realpath(str(path))
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        with open(path, "rb") as f:
+            return compile_scenario(parse(f.read()), extract_acts)
+
+    key = CACHE_PREFIX + hashlib.sha1(path.encode("utf8")).hexdigest()
+    stat = os.stat(path)
+    entry = cache.get(key, None)
+    if entry and entry.get("version") == CACHE_VERSION and entry.get("keys") == list(HEADER_KEYS) \
+            and entry.get("path") == path:
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry["scenario"]
+    else:
+        entry = None
+
+    with open(path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha1(content).hexdigest()
+    if entry is None or entry["hash"] != digest:
+        entry = {
+            "version": CACHE_VERSION,
+            "keys": list(HEADER_KEYS),
+            "path": path,
+            "hash": digest,
+            "scenario": compile_scenario(parse(content), extract_acts),
+        }
+    entry["mtime"] = stat.st_mtime
+    entry["size"] = stat.st_size
+    try:
+        cache.set(key, entry)
+    except (TypeError, ValueError):
+        # Values JSON can't represent (e.g. YAML dates) - just don't cache the file.
+        pass
+    return entry["scenario"]
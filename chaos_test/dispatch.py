@@ -0,0 +1,72 @@
+"""
+Dispatch table mode.
+
+Every target named anywhere in the scenario is patched once, when the
+scenario starts, with a trampoline. The trampoline calls what the current act
+does with the target - found in a table by the act's index - or the original
+if the act leaves the target alone. Moving to the next act only changes the
+index, however many targets it touches.
+"""
+from .patching import PatchSet, async_support, is_coroutine, raw_attribute, rewrap, unwrap
+
+
+class Cursor(object):
+    """
+    Index of the act currently active, shared by all trampolines of a scenario.
+    """
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+
+class DispatchTable(object):
+    """
+    Trampolines of a scenario, with the behavior of every target in every act.
+    """
+    def __init__(self, acts, lock=None):
+        # Past the last act - every trampoline calls the original.
+        self.idle = len(acts)
+        self.cursor = Cursor(self.idle)
+        self.indexes = {}
+        self.patches = PatchSet(lock)
+        behaviors = {}
+        for index, act in enumerate(acts):
+            self.indexes[act.name] = index
+            act.prepare()
+            # Trampolines pick the act, its wrappers are always on.
+            act.patches.gate.active = True
+            for owner, name, _ in act.patches.patches:
+                key = (id(owner), name)
+                if key not in behaviors:
+                    behaviors[key] = (owner, name, [None] * (len(acts) + 1))
+                behaviors[key][2][index] = act.patches.pending[key]
+        for owner, name, table in behaviors.values():
+            raw = raw_attribute(owner, name)
+            original = unwrap(raw)
+            table = [unwrap(behavior) if behavior is not None else None for behavior in table]
+            factory = async_support().trampoline_factory if is_coroutine(original) \
+                else trampoline_factory
+            self.patches.add(owner, name, rewrap(raw, factory(original, table, self.cursor)))
+
+    def switch(self, act=None):
+        """
+        Make `act` the active one, no act if None.
+        """
+        self.cursor.index = self.idle if act is None else self.indexes[act.name]
+
+    def apply(self):
+        self.patches.apply()
+
+    def revert(self):
+        self.switch(None)
+        self.patches.revert()
+
+
+def trampoline_factory(original, behaviors, cursor):
+    def trampoline(*args, **kwargs):
+        behavior = behaviors[cursor.index]
+        if behavior is None:
+            return original(*args, **kwargs)
+        return behavior(*args, **kwargs)
+    return trampoline
@@ -4,4 +4,12 @@ class UnreachableActException(Exception):
 
 class FailedAct(Exception):
     def __init__(self, message, act):
-        super(FailedAct, self).__init__(message)
\ No newline at end of file
+        super(FailedAct, self).__init__(message)
+
+class ResolutionError(ImportError):
+    """
+    Dotted path from a chaos file doesn't point to an importable object.
+    """
+    def __init__(self, path, reason):
+        super(ResolutionError, self).__init__("Cannot resolve '{}': {}".format(path, reason))
+        self.path = path
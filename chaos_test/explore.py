@@ -0,0 +1,285 @@
+"""
+Generated scenarios - exploring orderings of faults instead of writing acts by hand.
+
+A scenario file with a `generate` table lists targets and exceptions. Every
+(target, exception) pair is a fault, and sequences of faults are generated by
+a strategy:
+
+    single - every fault on its own
+    pairs  - every fault on its own, then every ordered pair of two different faults
+    random - `walks` random sequences of `length` faults, repeatable with `seed`
+
+Each sequence becomes its own scenario, one act per fault. While a sequence
+runs, code paths (line to line transitions) of the application are traced
+per act. An act that reached nothing new makes its sequence prefix stale, and
+longer sequences starting with a stale prefix are skipped - they only repeat
+orderings that already led nowhere.
+
+Only code of the entry point's top level package is traced - a single module
+entry point traces just that module. `include` in the `generate` table lists
+other files or directories to trace instead.
+"""
+import os
+import random
+import sys
+
+from pytest import Collector
+
+from .resolver import locate, resolve
+from .structure import Scenario, TEST_STATUS
+
+STRATEGIES = ("single", "pairs", "random")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def expand(spec):
+    """
+    Fault sequences the `generate` table asks for, shorter ones first.
+    """
+    assert isinstance(spec, dict), "generate is a table of targets, exceptions and a strategy."
+    targets = spec.get("targets")
+    exceptions = spec.get("exceptions", ["Exception"])
+    strategy = spec.get("strategy", "single")
+    assert targets and isinstance(targets, list), "generate needs a list of targets."
+    assert exceptions and isinstance(exceptions, list), "generate needs a list of exceptions."
+    assert strategy in STRATEGIES, "generate strategy has to be one of: {}".format(", ".join(STRATEGIES))
+
+    faults = [(target, exception) for target in targets for exception in exceptions]
+    sequences = [(fault,) for fault in faults]
+    if strategy == "pairs":
+        sequences += [(first, second) for first in faults for second in faults if first != second]
+    elif strategy == "random":
+        rng = random.Random(spec.get("seed"))
+        length = spec.get("length", 3)
+        walks = spec.get("walks", 10)
+        assert isinstance(length, int) and length > 0, "length of random walks has to be a positive integer."
+        assert isinstance(walks, int) and walks > 0, "number of random walks has to be a positive integer."
+        sequences = []
+        for _ in range(walks):
+            walk = []
+            while len(walk) < length:
+                fault = rng.choice(faults)
+                if walk and fault == walk[-1] and len(faults) > 1:
+                    continue
+                walk.append(fault)
+            if tuple(walk) not in sequences:
+                sequences.append(tuple(walk))
+    limit = spec.get("max-sequences")
+    if limit is not None:
+        sequences = sequences[:limit]
+    return sequences
+
+
+def sequence_name(index, sequence):
+    return "seq-{}[{}]".format(index, ",".join(
+        "{}:{}".format(target.rsplit(".", 1)[-1], exception) for target, exception in sequence))
+
+
+class Explorer(object):
+    """
+    Code paths reached by sequences of a file so far, and prefixes that reached nothing new.
+    """
+    def __init__(self, prune=True):
+        self.prune = prune
+        self.covered = set()
+        self.judged = set()
+        self.stale = set()
+
+    def pruned(self, sequence):
+        """
+        Stale prefix of `sequence`, None if it is worth running.
+        """
+        if not self.prune:
+            return None
+        for length in range(1, len(sequence)):
+            if sequence[:length] in self.stale:
+                return sequence[:length]
+        return None
+
+    def update(self, sequence, paths, completed):
+        """
+        Record paths reached by the first `completed` acts of `sequence`. A prefix is
+        judged by its first run only, later ones repeat it.
+        """
+        for index in range(completed):
+            prefix = sequence[:index + 1]
+            new = paths[index] - self.covered
+            self.covered |= paths[index]
+            if prefix not in self.judged:
+                self.judged.add(prefix)
+                if not new:
+                    self.stale.add(prefix)
+
+
+class Coverage(object):
+    """
+    Line to line transitions of the application, a set per act.
+    include - prefixes of the traced files
+    """
+    def __init__(self, acts, include):
+        self.paths = [set() for _ in range(acts + 1)]
+        self.current = self.paths[0]
+        self.include = include
+        self.files = {}
+
+    def switch(self, index):
+        self.current = self.paths[min(index, len(self.paths) - 1)]
+
+    def traced(self, filename):
+        included = self.files.get(filename)
+        if included is None:
+            path = os.path.abspath(filename)
+            included = path.startswith(self.include) and not path.startswith(PACKAGE_DIR)
+            self.files[filename] = included
+        return included
+
+    def tracer(self, frame, event, arg):
+        filename = frame.f_code.co_filename
+        if not self.traced(filename):
+            return None
+        previous = [frame.f_lineno]
+
+        def trace_lines(frame, event, arg):
+            if event == "line":
+                self.current.add((filename, previous[0], frame.f_lineno))
+                previous[0] = frame.f_lineno
+            return trace_lines
+        return trace_lines
+
+
+def source_root(entry_point):
+    """
+    Directory of the entry point's top level package, or the module itself if
+    it isn't a package.
+    """
+    module = resolve(entry_point.split(".")[0])
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return path_prefix(os.getcwd())
+    path = os.path.abspath(path)
+    if os.path.basename(path).startswith("__init__."):
+        return path_prefix(os.path.dirname(path))
+    # Compiled modules run the code of their source file.
+    return os.path.splitext(path)[0] + ".py"
+
+
+def path_prefix(path):
+    """
+    Prefix of files under `path` - a directory doesn't cover its namesakes with a suffix.
+    """
+    path = os.path.abspath(path)
+    return os.path.join(path, "") if os.path.isdir(path) else path
+
+
+def traced_paths(spec, entry_point):
+    """
+    Prefixes of files traced while sequences run - `include`, or the entry point's package.
+    """
+    include = spec.get("include")
+    if include is None:
+        return (source_root(entry_point),)
+    assert include and isinstance(include, list), "generate include is a list of files or directories to trace."
+    return tuple(path_prefix(path) for path in include)
+
+
+class ExploredScenario(Scenario):
+    """
+    Scenario of a generated sequence - skipped if a shorter sequence showed it leads
+    nowhere new, otherwise traced to guide the following ones.
+    """
+    def __init__(self, parent, app_factory, monkeypatch, acts, sequence=None, explorer=None,
+                 generate=None, **options):
+        self.sequence = sequence
+        self.explorer = explorer
+        self.generate = generate or {}
+        # Traced paths are known once the entry point is imported, when the scenario runs.
+        self.coverage = Coverage(len(acts), None)
+        super(ExploredScenario, self).__init__(parent, app_factory, monkeypatch, acts, **options)
+
+    def runtest(self, act_name):
+        if not self.started:
+            stale = self.explorer.pruned(self.sequence)
+            if stale is not None:
+                self.started = True
+                detail = "Pruned - {} reached no new code.".format(
+                    " > ".join("{}:{}".format(*fault) for fault in stale))
+                for act in self.acts:
+                    self.record(act.name, TEST_STATUS.SKIPPED, detail)
+        return super(ExploredScenario, self).runtest(act_name)
+
+    def run(self):
+        try:
+            super(ExploredScenario, self).run()
+        finally:
+            completed = 0
+            while completed < len(self.acts) and \
+                    self.act_results[self.acts[completed].name] == TEST_STATUS.SUCCESS:
+                completed += 1
+            self.explorer.update(self.sequence, self.coverage.paths, completed)
+
+    def next_test(self):
+        result = super(ExploredScenario, self).next_test()
+        self.coverage.switch(self.current_act)
+        return result
+
+    def app_target(self):
+        target = super(ExploredScenario, self).app_target()
+        if not self.explorer.prune:
+            return target
+        if self.coverage.include is None:
+            if callable(self.app_factory):
+                self.coverage.include = (path_prefix(os.getcwd()),)
+            else:
+                self.coverage.include = traced_paths(self.generate, self.app_factory)
+        tracer = self.coverage.tracer
+
+        def traced():
+            sys.settrace(tracer)
+            try:
+                target()
+            finally:
+                sys.settrace(None)
+        return traced
+
+
+class SequenceCollector(Collector):
+    """
+    Generated sequence of faults, collected as a scenario of its own.
+    """
+    def __init__(self, name, parent, sequence=None, compiled=None, explorer=None, options=None):
+        super(SequenceCollector, self).__init__(name, parent)
+        self.sequence = sequence
+        self.compiled = compiled
+        self.explorer = explorer
+        self.options = options
+
+    @classmethod
+    def create(cls, parent, name, **kwargs):
+        if hasattr(cls, "from_parent"):
+            return cls.from_parent(parent, name=name, **kwargs)
+        return cls(name, parent, **kwargs)
+
+    def collect(self):
+        monkeypatch = self.config.pluginmanager.get_plugin("monkeypatch")
+        acts = [{target: [{"exc": exception}]} for target, exception in self.sequence]
+        entry_point = self.compiled["entry-point"]
+        locate(entry_point)
+        scenario = ExploredScenario(self, entry_point, monkeypatch, acts,
+                                    sequence=self.sequence, explorer=self.explorer,
+                                    generate=self.compiled["generate"], **self.options)
+        scenario.path = self.nodeid
+        return scenario.acts
+
+
+def collect_sequences(collector, compiled, options):
+    """
+    A collector per generated sequence of the file.
+    """
+    spec = compiled["generate"]
+    assert compiled["next-point"], "Generated sequences need a global next-point."
+    explorer = Explorer(prune=spec.get("prune", True))
+    return [
+        SequenceCollector.create(collector, sequence_name(index, sequence), sequence=sequence,
+                                 compiled=compiled, explorer=explorer, options=options)
+        for index, sequence in enumerate(expand(spec))
+    ]
@@ -0,0 +1,131 @@
+"""
+Latency histograms of chosen targets.
+
+Targets listed under `histograms` are wrapped, underneath the acts' patches,
+with a recorder timing every call that reaches the original function. Times
+go into log-bucketed counters: a fixed list of integers per target and phase,
+allocated when the phase starts, so recording a call only bumps a counter.
+
+Buckets split every power of two of nanoseconds into 16 linear sub-buckets,
+so a recorded value is off by at most 1/16 (~6%) - the bucketing of HDR
+histograms, keeping the top 5 bits of every value.
+"""
+import time
+
+CLOCK = getattr(time, "perf_counter", time.time)
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF = SUB_BUCKETS // 2
+# Values up to 2**40ns (~18 minutes), longer ones land in the last bucket.
+MAX_BITS = 40
+BUCKETS = SUB_BUCKETS + (MAX_BITS - SUB_BUCKET_BITS) * HALF
+PERCENTILES = (("p50", 0.5), ("p99", 0.99), ("p999", 0.999))
+
+
+def bucket_of(nanoseconds):
+    if nanoseconds < SUB_BUCKETS:
+        return max(nanoseconds, 0)
+    shift = nanoseconds.bit_length() - SUB_BUCKET_BITS
+    return min(SUB_BUCKETS + (shift - 1) * HALF + (nanoseconds >> shift) - HALF, BUCKETS - 1)
+
+
+def bucket_limit(index):
+    """
+    Highest value, in nanoseconds, counted in bucket `index`.
+    """
+    if index < SUB_BUCKETS:
+        return index
+    shift = (index - SUB_BUCKETS) // HALF + 1
+    sub_bucket = (index - SUB_BUCKETS) % HALF + HALF
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class Histogram(object):
+    """
+    Call latencies of one target in one phase.
+    """
+    __slots__ = ("counts", "total", "maximum")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0
+        self.maximum = 0
+
+    def record(self, seconds):
+        nanoseconds = int(seconds * 1e9)
+        self.counts[bucket_of(nanoseconds)] += 1
+        self.total += 1
+        if nanoseconds > self.maximum:
+            self.maximum = nanoseconds
+
+    def percentile(self, fraction):
+        """
+        Seconds at most `fraction` of calls took, None without calls.
+        """
+        if not self.total:
+            return None
+        rank = max(int(fraction * self.total + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_limit(index), self.maximum) / 1e9
+        return self.maximum / 1e9
+
+    def summary(self):
+        summary = {"count": self.total, "max": self.maximum / 1e9 if self.total else None}
+        for name, fraction in PERCENTILES:
+            summary[name] = self.percentile(fraction)
+        return summary
+
+
+class Slot(object):
+    """
+    Histogram a target's recorder writes to - swapped when a phase starts.
+    """
+    __slots__ = ("histogram",)
+
+    def __init__(self):
+        self.histogram = Histogram()
+
+
+class HistogramRecorder(object):
+    """
+    Histograms of every listed target, kept per phase - the warm-up and every act.
+    """
+    def __init__(self, targets):
+        assert isinstance(targets, list), "histograms is a list of dotted paths to time."
+        self.targets = [target.strip() for target in targets]
+        self.slots = dict((target, Slot()) for target in self.targets)
+        self.phases = {}
+
+    def switch(self, phase):
+        """
+        Record into fresh histograms of `phase` from now on.
+        """
+        histograms = {}
+        for target, slot in self.slots.items():
+            histograms[target] = slot.histogram = Histogram()
+        self.phases[phase] = histograms
+
+    def summary(self, phase):
+        """
+        Percentiles of every target in `phase`, None if the phase never started.
+        """
+        histograms = self.phases.get(phase)
+        if histograms is None:
+            return None
+        return dict((target, histogram.summary()) for target, histogram in histograms.items())
+
+
+def timed_factory(original, slot):
+    def timed(*args, **kwargs):
+        # Counted in the phase the call started in.
+        histogram = slot.histogram
+        start = CLOCK()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            histogram.record(CLOCK() - start)
+    return timed
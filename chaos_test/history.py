@@ -0,0 +1,157 @@
+"""
+Results history - metrics of every act that ran, kept across sessions.
+
+Each session appends a row per act to an SQLite database in pytest's cache
+directory: its status, duration, exceptions raised, recovery time and
+throughput. Nothing is ever updated or removed - `--cache-clear` starts a new
+history, `-p no:cacheprovider` disables it.
+
+With --chaos-compare an act's recovery time is compared with the recovery
+times of its latest runs. It is flagged as a regression when it is more than
+THRESHOLD standard deviations above their mean, and slower than the mean by at
+least MIN_SLOWDOWN - timing noise of very stable acts doesn't count.
+
+Under pytest-xdist acts run, and are recorded and compared, in the workers.
+The controller has no act metrics, so it prints no chaos regressions summary.
+"""
+import math
+import os
+import time
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from .report import STATUS_NAMES
+from .structure import Act, Actor
+
+HISTORY_DIR = "chaos_test"
+HISTORY_FILE = "history.sqlite"
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS acts (run REAL NOT NULL, nodeid TEXT NOT NULL, status TEXT, "
+    "duration REAL, raised INTEGER, recovery REAL, throughput REAL)",
+    "CREATE INDEX IF NOT EXISTS acts_by_node ON acts (nodeid, run)",
+)
+# Runs an act needs in the history before it is compared.
+MIN_RUNS = 5
+# Latest runs compared with.
+WINDOW = 20
+THRESHOLD = 3
+MIN_SLOWDOWN = 0.1
+
+
+class History(object):
+    """
+    Append-only store of act metrics.
+    """
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+
+    def append(self, run, rows):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO acts (run, nodeid, status, duration, raised, recovery, throughput) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run, row["nodeid"], row["status"], row["duration"], row["raised"], row["recovery"],
+                  row["throughput"]) for row in rows])
+
+    def recoveries(self, nodeid, limit=WINDOW):
+        """
+        Recovery times of the latest runs of the act, newest first.
+        """
+        cursor = self.connection.execute(
+            "SELECT recovery FROM acts WHERE nodeid = ? AND recovery IS NOT NULL ORDER BY run DESC LIMIT ?",
+            (nodeid, limit))
+        return [recovery for recovery, in cursor.fetchall()]
+
+    def close(self):
+        self.connection.close()
+
+
+def history_path(config):
+    """
+    Path of the history database, None if there's no cache or no sqlite3.
+    """
+    cache = getattr(config, "cache", None)
+    if cache is None or sqlite3 is None:
+        return None
+    return os.path.join(str(cache.makedir(HISTORY_DIR)), HISTORY_FILE)
+
+
+def act_rows(items):
+    """
+    History rows of all acts among `items` that ran.
+    """
+    rows = []
+    for item in items:
+        if not isinstance(item, Act) or not item.metrics:
+            continue
+        metrics = item.metrics
+        rows.append({
+            "nodeid": act_id(item),
+            "status": STATUS_NAMES.get(item.scenario.act_results.get(item.name), "not reached"),
+            "duration": metrics["duration"],
+            "raised": sum(target["hits"] for target in metrics["targets"].values()
+                          if target["kind"] == Actor.KIND),
+            "recovery": metrics.get("recovery"),
+            "throughput": metrics.get("throughput"),
+        })
+    return rows
+
+
+def act_id(item):
+    """
+    Act's key in the history - acts are collected next to their file, so the
+    item's own node id doesn't tell scenarios apart.
+    """
+    if item.scenario.path:
+        return "{}::{}".format(item.scenario.path, item.name)
+    return item.nodeid
+
+
+def regressions(history, rows):
+    """
+    Acts among `rows` which recovered slower than their history, with the numbers compared.
+    """
+    flagged = []
+    for row in rows:
+        if row["recovery"] is None:
+            continue
+        past = history.recoveries(row["nodeid"])
+        if len(past) < MIN_RUNS:
+            continue
+        mean = sum(past) / len(past)
+        deviation = math.sqrt(sum((recovery - mean) ** 2 for recovery in past) / (len(past) - 1))
+        if row["recovery"] > mean + THRESHOLD * deviation and row["recovery"] > mean * (1 + MIN_SLOWDOWN):
+            flagged.append({
+                "nodeid": row["nodeid"],
+                "recovery": row["recovery"],
+                "mean": mean,
+                "deviation": deviation,
+                "runs": len(past),
+            })
+    return flagged
+
+
+def record_history(config, items, compare=False):
+    """
+    Append this session's acts to the history. Returns the regressions if
+    `compare`, None if not comparing, or there's no history or no act that ran -
+    sessions without chaos acts leave no database behind.
+    """
+    rows = act_rows(items)
+    if not rows:
+        return None
+    path = history_path(config)
+    if path is None:
+        return None
+    history = History(path)
+    try:
+        flagged = regressions(history, rows) if compare else None
+        history.append(time.time(), rows)
+    finally:
+        history.close()
+    return flagged
@@ -1,25 +1,87 @@
 import pytest
 
-from .parser import TomlChaosFile, YamlChaosFile
+from .parser import format_for
+from .isolation import ProcessScenario, WorkerPool
+from .history import record_history
+from .report import write_report
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("chaos_test")
+    group.addoption("--chaos-isolate", action="store_true", default=False,
+                    help="Run every chaos scenario in its own worker process.")
+    group.addoption("--chaos-workers", type=int, default=None,
+                    help="Maximum number of chaos worker processes running at once (default: CPU count).")
+    group.addoption("--chaos-timeout", type=float, default=None,
+                    help="Seconds a chaos scenario may run, unless its file sets a timeout.")
+    group.addoption("--chaos-stream", action="store_true", default=False,
+                    help="Stream acts of YAML and JSON lines scenarios from the file as they are reached, instead of "
+                         "loading whole files at collection.")
+    group.addoption("--chaos-dispatch", action="store_true", default=False,
+                    help="Patch every target of a scenario once, with a trampoline dispatching to the "
+                         "current act - act transitions don't patch anything.")
+    group.addoption("--chaos-baseline", action="store_true", default=False,
+                    help="Measure the application without chaos before the first act, and report acts' "
+                         "throughput and latency as ratios of it.")
+    group.addoption("--chaos-report", default=None, metavar="PATH",
+                    help="Write per-act metrics of chaos scenarios as JSON to PATH.")
+    group.addoption("--chaos-compare", action="store_true", default=False,
+                    help="Flag acts which recovered slower than their history in earlier sessions.")
+
+
+def pytest_configure(config):
+    if config.getoption("chaos_isolate"):
+        config.chaos_pool = WorkerPool(config.getoption("chaos_workers"))
+
+
+def pytest_unconfigure(config):
+    pool = getattr(config, "chaos_pool", None)
+    if pool is not None:
+        pool.shutdown()
 
 def pytest_collect_file(path, parent):
     if path.basename.startswith("chaos_"):
-        if path.ext == ".toml":
-            if hasattr(TomlChaosFile, "from_parent"):
-                return TomlChaosFile.from_parent(parent, fspath=path)
-            else:
-                return TomlChaosFile(path, parent)
-        elif path.ext in [".yaml", ".yml"]:
-            if hasattr(TomlChaosFile, "from_parent"):
-                return YamlChaosFile.from_parent(parent, fspath=path)
-            else:
-                return YamlChaosFile(path, parent)
+        chaos_file = format_for(path.ext)
+        if chaos_file is not None:
+            return chaos_file.create(parent, path)
     return None
 
 
 def pytest_collection_modifyitems(session, config, items):
     pass
 
+
+def pytest_collection_finish(session):
+    # Start isolated scenarios up front, so they run in parallel while pytest
+    # walks through the items.
+    for item in session.items:
+        scenario = getattr(item, "scenario", None)
+        if isinstance(scenario, ProcessScenario):
+            scenario.submit()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    items = getattr(session, "items", [])
+    path = session.config.getoption("chaos_report", None)
+    if path:
+        write_report(path, items)
+    session.config.chaos_regressions = record_history(
+        session.config, items, compare=session.config.getoption("chaos_compare", False))
+
+
+def pytest_terminal_summary(terminalreporter):
+    regressions = getattr(terminalreporter.config, "chaos_regressions", None)
+    if regressions is None:
+        return
+    terminalreporter.write_sep("=", "chaos regressions")
+    if not regressions:
+        terminalreporter.write_line("No act recovered slower than in its history.")
+    for regression in regressions:
+        terminalreporter.write_line(
+            "{}: recovery {:.1f}ms, history {:.1f}ms +- {:.1f}ms over {} runs".format(
+                regression["nodeid"], regression["recovery"] * 1000, regression["mean"] * 1000,
+                regression["deviation"] * 1000, regression["runs"]), red=True)
+
 # def pytest_configure(config):
 #     config.addinivalue_line("markers", "cool_marker: this one is for cool tests.")
 #     config.addinivalue_line(
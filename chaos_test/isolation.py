@@ -0,0 +1,222 @@
+"""
+Process isolated execution of scenarios.
+
+Every scenario is replayed in its own worker process: the worker applies the
+patches, runs the application and streams act results back over a pipe. A
+pool bounds how many workers run at the same time, so independent scenarios
+run in parallel across cores, while a hung or crashed application only takes
+down its own worker.
+"""
+from collections import deque
+import copy
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+
+from .structure import Scenario, Stage, TEST_STATUS
+
+LOG = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+# Time a worker gets on top of the scenario timeout to report before it is killed.
+DEADLINE_GRACE = 5
+
+
+class IsolatedStage(Stage):
+    """
+    Act replayed inside a worker - same actors, but no pytest node behind it.
+    """
+    def __init__(self, name, scenario, act_info, last):
+        self.setup_stage(name, scenario, act_info, last)
+
+
+class IsolatedScenario(Scenario):
+    """
+    Scenario running inside a worker process. Every recorded result is sent
+    to the parent as soon as it is known.
+    """
+    def __init__(self, connection, app_factory, monkeypatch, acts, **options):
+        self.connection = connection
+        super(IsolatedScenario, self).__init__(None, app_factory, monkeypatch, acts, **options)
+
+    def create_act(self, name, act_info, last):
+        return IsolatedStage(name, self, act_info, last)
+
+    def record(self, act_name, status, detail=None):
+        super(IsolatedScenario, self).record(act_name, status, detail)
+        metrics = next(act.metrics for act in self.acts if act.name == act_name)
+        self.connection.send(("RESULT", act_name, (status, detail, metrics)))
+
+
+def run_worker(spec, connection):
+    """
+    Worker process entry - rebuild the scenario from its spec and run it.
+    """
+    try:
+        from _pytest import monkeypatch
+        scenario = IsolatedScenario(
+            connection, spec["entry-point"], monkeypatch, spec["acts"], **spec["options"])
+        scenario.run()
+    except BaseException:
+        connection.send(("ERROR", None, traceback.format_exc()))
+    connection.send(("DONE", None, None))
+    connection.close()
+    # Application threads which never finished must not keep the worker alive.
+    os._exit(0)
+
+
+class WorkerHandle(object):
+    """
+    Parent side of a single scenario submitted to the pool.
+    """
+    def __init__(self, pool, spec):
+        self.pool = pool
+        self.spec = spec
+        self.process = None
+        self.connection = None
+        self.results = {}
+        self.details = {}
+        self.metrics = {}
+        self.error = None
+        self.finished = False
+        self.deadline = None
+
+    def start(self):
+        self.connection, child = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=run_worker, args=(self.spec, child))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        timeout = self.spec["options"].get("timeout")
+        if timeout:
+            self.deadline = time.time() + timeout + DEADLINE_GRACE
+
+    @property
+    def running(self):
+        return self.process is not None and not self.finished
+
+    def drain(self):
+        """
+        Read every message available on the pipe without blocking.
+        """
+        if not self.running:
+            return
+        while self.connection.poll():
+            try:
+                command, act_name, payload = self.connection.recv()
+            except EOFError:
+                break
+            if command == "RESULT":
+                self.results[act_name], detail, self.metrics[act_name] = payload
+                if detail:
+                    self.details[act_name] = detail
+            elif command == "ERROR":
+                self.error = payload
+            elif command == "DONE":
+                self.close()
+                return
+        if not self.process.is_alive():
+            self.crashed("Chaos worker exited with code {}.".format(self.process.exitcode))
+        elif self.deadline is not None and time.time() > self.deadline:
+            self.crashed("Chaos worker did not finish before the scenario deadline.")
+
+    def crashed(self, reason):
+        """
+        Worker died or hung without reporting completion - fail the act that was running.
+        """
+        for act in self.spec["acts-names"]:
+            if act not in self.results:
+                LOG.error("%s Entry point %s, act %s", reason, self.spec["entry-point"], act)
+                self.results[act] = TEST_STATUS.FAILURE
+                self.details[act] = reason
+                break
+        self.close()
+
+    def close(self):
+        self.finished = True
+        self.connection.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def terminate(self):
+        if self.running:
+            self.close()
+
+    def result(self, act_name):
+        """
+        Block until the worker reports on the act or finishes.
+        """
+        while act_name not in self.results and not self.finished:
+            self.pool.pump()
+            if self.running:
+                self.connection.poll(POLL_INTERVAL)
+            else:
+                time.sleep(POLL_INTERVAL)
+        if self.error and act_name not in self.results:
+            raise RuntimeError("Chaos worker failed:\n{}".format(self.error))
+        return self.results.get(act_name, TEST_STATUS.UNDEFINED)
+
+
+class WorkerPool(object):
+    """
+    Runs submitted scenarios in worker processes, at most `workers` at a time.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.pending = deque()
+        self.running = []
+
+    def submit(self, spec):
+        handle = WorkerHandle(self, spec)
+        self.pending.append(handle)
+        self.pump()
+        return handle
+
+    def pump(self):
+        for handle in self.running:
+            handle.drain()
+        self.running = [handle for handle in self.running if handle.running]
+        while self.pending and len(self.running) < self.workers:
+            handle = self.pending.popleft()
+            handle.start()
+            self.running.append(handle)
+
+    def shutdown(self):
+        self.pending.clear()
+        for handle in self.running:
+            handle.terminate()
+        self.running = []
+
+
+class ProcessScenario(Scenario):
+    """
+    Scenario collected in the pytest process but executed in a worker.
+    """
+    def __init__(self, parent, app_factory, monkeypatch, acts, entry_point=None, pool=None, **options):
+        self.spec = {
+            "entry-point": entry_point,
+            "options": copy.deepcopy(options),
+            "acts": copy.deepcopy(acts),
+        }
+        self.pool = pool
+        self.handle = None
+        super(ProcessScenario, self).__init__(parent, app_factory, monkeypatch, acts, **options)
+        self.spec["acts-names"] = [act.name for act in self.acts]
+
+    def submit(self):
+        if self.handle is None:
+            self.handle = self.pool.submit(self.spec)
+
+    def runtest(self, act_name):
+        self.submit()
+        status = self.handle.result(act_name)
+        self.act_results[act_name] = status
+        if act_name in self.handle.details:
+            self.act_details[act_name] = self.handle.details[act_name]
+        for act in self.acts:
+            if act.name == act_name:
+                act.metrics = self.handle.metrics.get(act_name)
+        return status
@@ -0,0 +1,155 @@
+"""
+Background load - traffic driving request based applications during every act.
+
+A scenario level `load` table names a callable (or coroutine function) and how
+hard to call it:
+
+    target - dotted path of the callable, called without arguments
+    concurrency - number of workers calling it in a loop, 1 by default
+    rate - optional, calls per second shared by all workers
+
+Workers run from the moment the first act is active until the scenario is
+over. Every call is counted as a success or an error, with its latency,
+towards the act active when it finished.
+"""
+import math
+import threading
+import time
+
+from .patching import async_support, is_coroutine
+from .resolver import resolve
+
+CLOCK = getattr(time, "perf_counter", time.time)
+# Seconds a stopping worker gets to finish its call.
+JOIN_TIMEOUT = 1
+PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+
+class Pacer(object):
+    """
+    Hands out evenly spaced call slots to workers sharing a rate.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = None
+
+    def reserve(self):
+        """
+        Seconds to wait before making the call of the slot reserved.
+        """
+        with self.lock:
+            now = CLOCK()
+            slot = now if self.next_slot is None or self.next_slot < now else self.next_slot
+            self.next_slot = slot + self.interval
+        return slot - now
+
+
+class LoadStats(object):
+    """
+    Calls finished while an act was active.
+    """
+    __slots__ = ("successes", "errors", "latencies")
+
+    def __init__(self):
+        self.successes = 0
+        self.errors = 0
+        self.latencies = []
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        summary = {
+            "requests": len(latencies),
+            "successes": self.successes,
+            "errors": self.errors,
+            "max": latencies[-1] if latencies else None,
+        }
+        for name, fraction in PERCENTILES:
+            summary[name] = percentile(latencies, fraction)
+        return summary
+
+
+class LoadGenerator(object):
+    """
+    Workers calling the load target for the whole scenario.
+    """
+    def __init__(self, spec):
+        assert isinstance(spec, dict), "load is a table with a target, concurrency and rate."
+        self.target_path = spec.get("target")
+        self.concurrency = spec.get("concurrency", 1)
+        self.rate = spec.get("rate")
+        assert self.target_path, "load needs a target to call."
+        assert isinstance(self.concurrency, int) and self.concurrency > 0, \
+            "load concurrency has to be a positive integer."
+        if self.rate is not None:
+            assert isinstance(self.rate, (int, float)) and self.rate > 0, \
+                "load rate has to be a positive number of calls per second."
+        self.pacer = Pacer(self.rate) if self.rate else None
+        self.target = None
+        self.current = None
+        self.buckets = {}
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.target = resolve(self.target_path)
+        if is_coroutine(self.target):
+            aio = async_support()
+            self.threads = [threading.Thread(target=aio.run, args=(aio.load_workers(self),))]
+        else:
+            self.threads = [threading.Thread(target=self.work) for _ in range(self.concurrency)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join(JOIN_TIMEOUT)
+        self.threads = []
+
+    def switch(self, act_name):
+        """
+        Count calls towards `act_name` from now on.
+        """
+        bucket = LoadStats()
+        self.buckets[act_name] = bucket
+        self.current = bucket
+
+    def record(self, latency, success):
+        bucket = self.current
+        if bucket is None:
+            return
+        if success:
+            bucket.successes += 1
+        else:
+            bucket.errors += 1
+        bucket.latencies.append(latency)
+
+    def collect(self, act_name):
+        bucket = self.buckets.get(act_name)
+        return bucket.summary() if bucket is not None else None
+
+    def work(self):
+        while not self.stopped.is_set():
+            if self.pacer is not None:
+                wait = self.pacer.reserve()
+                if wait > 0 and self.stopped.wait(wait):
+                    break
+            start = CLOCK()
+            try:
+                self.target()
+                success = True
+            except Exception:
+                success = False
+            self.record(CLOCK() - start, success)
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of sorted values, None if there are none.
+    """
+    if not ordered:
+        return None
+    rank = int(math.ceil(fraction * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
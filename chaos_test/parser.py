@@ -69,79 +69,232 @@ So - the hierarchy is:
 from pytest import File, Item, Collector
 
 from .structure import Scenario, Act
+from .isolation import ProcessScenario
+from .cache import HEADER_KEYS, load_scenario
+from .explore import collect_sequences
 
-from werkzeug.utils import import_string
+from .resolver import locate
+from .stream import compile_lines, compile_stream, import_yaml
 
+import json
 import toml
-import yaml
+try:
+    # Optional, considerably faster on large generated scenarios.
+    import orjson
+except ImportError:
+    orjson = None
 
 
-class TomlChaosFile(File):
+def json_loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content.decode('utf8'))
+
+
+def scenario_options(config, compiled):
     """
-    Custom Container for toml files.
+    Keyword arguments of a Scenario for a compiled file - header keys as they
+    are, with underscores, and the command line options on top.
+    """
+    options = dict((key.replace("-", "_"), compiled.get(key)) for key in HEADER_KEYS
+                   if key not in ("entry-point", "next-point", "generate"))
+    options["global_next"] = compiled["next-point"]
+    if options["timeout"] is None:
+        options["timeout"] = config.getoption("chaos_timeout", None)
+    options["dispatch"] = config.getoption("chaos_dispatch", False)
+    if config.getoption("chaos_baseline", False):
+        options["baseline"] = options["baseline"] or {}
+    else:
+        options["baseline"] = None
+    return options
+
+
+def create_scenario(collector, compiled):
     """
+    Build the scenario for a compiled file, in a worker process if isolation is enabled.
+    """
+    entry_point = compiled["entry-point"]
+    acts = compiled["acts"]
+    options = scenario_options(collector.config, compiled)
+    monkeypatch = collector.config.pluginmanager.get_plugin("monkeypatch")
+    # Imported once the scenario runs - collection doesn't import the application.
+    locate(entry_point)
+    pool = getattr(collector.config, "chaos_pool", None)
+    if pool is not None:
+        return ProcessScenario(collector.parent, entry_point, monkeypatch, acts,
+                               entry_point=entry_point, pool=pool, **options)
+    return Scenario(collector.parent, entry_point, monkeypatch, acts, **options)
+
+
+class ChaosFile(File):
+    """
+    Scenario file. Formats only say how content is loaded - validation, caching,
+    resolution and building of the scenario are shared.
+
+    SCENARIO_HEADER - key holding the list of acts
+    load - turns file content (bytes) into a dict
+    stream - optional, compiles the file with acts loaded only once they are reached
+    """
+    SCENARIO_HEADER = "acts"
+    stream = None
 
-    SCENARIO_HEADER = "act"
     def __init__(self, fspath, parent):
         self.config = parent.config
-        super(TomlChaosFile, self).__init__(fspath, parent=parent)
+        super(ChaosFile, self).__init__(fspath, parent=parent)
+
+    @classmethod
+    def create(cls, parent, path):
+        if hasattr(cls, "from_parent"):
+            return cls.from_parent(parent, fspath=path)
+        return cls(path, parent)
 
     @staticmethod
-    def extract_acts(data):
+    def load(content):
+        raise NotImplementedError()
+
+    @classmethod
+    def parse(cls, content):
+        return cls.load(content)
+
+    @classmethod
+    def extract_acts(cls, data):
         acts = []
-        for act in data.get(TomlChaosFile.SCENARIO_HEADER, []):
+        for act in data.get(cls.SCENARIO_HEADER, []):
             acts.append(act)
         return acts
 
+    def compile(self):
+        if self.stream is not None and self.config.getoption("chaos_stream", False):
+            return self.stream(self.fspath)
+        return load_scenario(self.config, self.fspath, self.parse, self.extract_acts)
+
     def collect(self):
-        raw = toml.load(self.fspath.open(encoding='utf8'))
-        app_factory = raw.get('entry-point')
-        global_next = raw.get('next-point')
+        compiled = self.compile()
 
-        assert app_factory is not None, "Define entry point to run chaos testing."
-        assert self.config.pluginmanager.get_plugin("monkeypatch"), "Monkeypatch is not available."
+        assert self.config.pluginmanager.get_plugin(
+            "monkeypatch"), "Monkeypatch is not available."
 
-        app_factory = import_string(app_factory)
+        if compiled.get("generate"):
+            # Generated sequences are traced, so they always run in this process.
+            return collect_sequences(self, compiled, scenario_options(self.config, compiled))
+        scenario = create_scenario(self, compiled)
+        scenario.path = self.nodeid
+        return scenario.acts
 
-        acts = self.extract_acts(raw)
 
-        scenario = Scenario(
-            self.parent, app_factory, self.config.pluginmanager.get_plugin("monkeypatch"), acts, global_next=global_next
-        )
+def toml_load(content):
+    return toml.loads(content.decode('utf8'))
 
-        return scenario.acts
 
-class YamlChaosFile(File):
+def yaml_load(content):
+    return import_yaml().safe_load(content)
+
+
+def json_lines_load(content):
+    lines = [line for line in content.splitlines() if line.strip()]
+    if not lines:
+        return {}
+    data = json_loads(lines[0])
+    assert isinstance(data, dict), "First line has to hold the scenario's settings."
+    data[JsonLinesChaosFile.SCENARIO_HEADER] = [json_loads(line) for line in lines[1:]]
+    return data
+
+
+class TomlChaosFile(ChaosFile):
+    """
+    Custom Container for toml files.
+    """
+    SCENARIO_HEADER = "act"
+    load = staticmethod(toml_load)
+
+
+class YamlChaosFile(ChaosFile):
     """
     Parse .yaml file into a scenario.
     """
-    SCENARIO_HEADER = "acts"
-    def __init__(self, fspath, parent):
-        self.config = parent.config
-        super(YamlChaosFile, self).__init__(fspath, parent=parent)
+    load = staticmethod(yaml_load)
+    stream = staticmethod(compile_stream)
+
+
+class JsonChaosFile(ChaosFile):
+    """
+    Parse .json file into a scenario - same schema as the YAML one.
+    """
+    load = staticmethod(json_loads)
+
+
+class JsonLinesChaosFile(ChaosFile):
+    """
+    Parse .jsonl file into a scenario - first line holds the scenario's settings
+    (entry-point, next-point, ...), every following line is an act.
+    """
+    load = staticmethod(json_lines_load)
 
     @staticmethod
-    def extract_acts(data):
-        acts = []
-        for act in data.get(YamlChaosFile.SCENARIO_HEADER, []):
-            acts.append(act)
-        return acts
+    def stream(path):
+        return compile_lines(path, json_loads)
 
-    def collect(self):
-        raw = yaml.safe_load(self.fspath.open(encoding='utf8'))
-        app_factory = raw.get('entry-point')
-        global_next = raw.get('next-point')
 
-        assert app_factory is not None, "Define entry point to run chaos testing."
-        assert self.config.pluginmanager.get_plugin(
-            "monkeypatch"), "Monkeypatch is not available."
+# File extension -> ChaosFile subclass.
+FORMATS = {}
+ENTRY_POINT_GROUP = "chaos_test.formats"
+_entry_points_loaded = []
 
-        app_factory = import_string(app_factory)
 
-        acts = self.extract_acts(raw)
+def register_format(extensions, load, header="acts", stream=None):
+    """
+    Collect chaos_* files with any of `extensions` (".ini", ...) as scenarios.
+    load - either a ChaosFile subclass, or a function turning file content (bytes) into a dict
+    header - key holding the list of acts, if `load` is a function
+    stream - optional, `ChaosFile.stream` if `load` is a function
+    """
+    if isinstance(load, type) and issubclass(load, ChaosFile):
+        chaos_file = load
+    else:
+        attributes = {"SCENARIO_HEADER": header, "load": staticmethod(load)}
+        if stream is not None:
+            attributes["stream"] = staticmethod(stream)
+        chaos_file = type(str("RegisteredChaosFile"), (ChaosFile,), attributes)
+    if isinstance(extensions, str):
+        extensions = [extensions]
+    for extension in extensions:
+        FORMATS["." + extension.lstrip(".")] = chaos_file
+    return chaos_file
+
+
+def iter_entry_points(group):
+    try:
+        from importlib import metadata
+    except ImportError:
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(group))
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return list(entry_points.select(group=group))
+    return list(entry_points.get(group, []))
+
+
+def load_entry_points():
+    """
+    Register formats of installed packages - entry points named after the file extension
+    in the "chaos_test.formats" group, pointing at a load function or a ChaosFile subclass.
+    """
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded.append(True)
+    for entry_point in iter_entry_points(ENTRY_POINT_GROUP):
+        register_format(entry_point.name, entry_point.load())
 
-        scenario = Scenario(
-            self.parent, app_factory, self.config.pluginmanager.get_plugin("monkeypatch"), acts, global_next=global_next
-        )
 
-        return scenario.acts
+def format_for(extension):
+    """
+    ChaosFile subclass collecting files with `extension`, None if there is none.
+    """
+    load_entry_points()
+    return FORMATS.get(extension)
+
+
+register_format("toml", TomlChaosFile)
+register_format(["yaml", "yml"], YamlChaosFile)
+register_format("json", JsonChaosFile)
+register_format("jsonl", JsonLinesChaosFile)
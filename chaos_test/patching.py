@@ -0,0 +1,176 @@
+"""
+Act level patching.
+
+An act's patches are prepared as one PatchSet - every target and its
+replacement - and only then applied in one go. Replacements check the act's
+Gate before acting: the gate opens once all of them are in place and closes
+before any is removed, so the application never sees half of an act.
+
+The next act is prepared while the current one runs, wrapping the targets'
+values from underneath the current act's patches, so a transition is just
+reverting one batch and applying another.
+
+Attributes of classes are handled as stored in the class: the function inside
+a staticmethod, classmethod or property is wrapped, and the wrapper put back
+into the same kind of descriptor.
+"""
+import inspect
+import threading
+
+NOTSET = object()
+
+
+def is_coroutine(obj):
+    """
+    Whether `obj` is a coroutine or coroutine function - checked without importing asyncio.
+    """
+    iscoroutinefunction = getattr(inspect, "iscoroutinefunction", None)
+    if iscoroutinefunction is None:
+        return False
+    return iscoroutinefunction(obj) or inspect.iscoroutine(obj)
+
+
+def async_support():
+    """
+    The aio module, imported only once a coroutine shows up - synchronous
+    applications never load asyncio.
+    """
+    from . import aio
+    return aio
+
+
+class Gate(object):
+    """
+    Whether an act's wrappers act, or just call the original.
+    """
+    __slots__ = ("active",)
+
+    def __init__(self):
+        self.active = False
+
+
+class PatchSet(object):
+    """
+    Replacements of an act's targets, applied and reverted as a batch.
+    """
+    def __init__(self, lock=None, below=None):
+        self.lock = lock or threading.Lock()
+        self.below = below
+        self.gate = Gate()
+        self.patches = []
+        self.pending = {}
+        self.saved = []
+        self.originals = {}
+
+    def current(self, owner, name):
+        """
+        Value the target will have once patches added so far are applied - so
+        patches of the same target wrap each other. Patches of the set `below`
+        are seen through, they are reverted before this set is applied.
+        """
+        key = (id(owner), name)
+        if key in self.pending:
+            return self.pending[key]
+        if self.below is not None:
+            return self.below.original(owner, name)
+        return raw_attribute(owner, name)
+
+    def original(self, owner, name):
+        """
+        Value of the target before this set was applied.
+        """
+        original = self.originals.get((id(owner), name), NOTSET)
+        if original is NOTSET:
+            return raw_attribute(owner, name)
+        return original
+
+    def add(self, owner, name, replacement):
+        self.patches.append((owner, name, replacement))
+        self.pending[(id(owner), name)] = replacement
+
+    def apply(self):
+        with self.lock:
+            for owner, name, replacement in self.patches:
+                if inspect.isclass(owner):
+                    # Inherited attributes are removed again on revert, not copied down.
+                    original = owner.__dict__.get(name, NOTSET)
+                else:
+                    original = getattr(owner, name, NOTSET)
+                self.saved.append((owner, name, original))
+                key = (id(owner), name)
+                if key not in self.originals:
+                    self.originals[key] = raw_attribute(owner, name) if original is NOTSET else original
+                setattr(owner, name, replacement)
+            self.gate.active = True
+            # Only needed while preparing - don't keep every earlier set alive.
+            self.below = None
+
+    def revert(self):
+        with self.lock:
+            self.gate.active = False
+            self.originals.clear()
+            while self.saved:
+                owner, name, original = self.saved.pop()
+                if original is NOTSET:
+                    delattr(owner, name)
+                else:
+                    setattr(owner, name, original)
+
+
+def raw_attribute(owner, name):
+    """
+    Attribute as stored - for classes the descriptor from the class or its bases,
+    not what it binds to.
+    """
+    if inspect.isclass(owner):
+        for klass in inspect.getmro(owner):
+            if name in klass.__dict__:
+                return klass.__dict__[name]
+    return getattr(owner, name)
+
+
+def unwrap(value):
+    """
+    Function a descriptor wraps - the one patches wrap in turn.
+    """
+    if isinstance(value, (staticmethod, classmethod)):
+        return value.__func__
+    if isinstance(value, property):
+        return value.fget
+    return value
+
+
+def rewrap(value, function):
+    """
+    `function` in the same kind of descriptor as `value`.
+    """
+    if isinstance(value, staticmethod):
+        return staticmethod(function)
+    if isinstance(value, classmethod):
+        return classmethod(function)
+    if isinstance(value, property):
+        return property(function, value.fset, value.fdel, value.__doc__)
+    return function
+
+
+def instance_matcher(where=None, predicate=None):
+    """
+    Whether an instance is one the chaos is meant for - all attributes in `where`
+    equal, and `predicate` (if any) true for it.
+    """
+    where = sorted((where or {}).items())
+
+    def matches(instance):
+        for name, value in where:
+            if getattr(instance, name, NOTSET) != value:
+                return False
+        return predicate is None or bool(predicate(instance))
+    return matches
+
+
+def select_factory(wrapper, original, matches):
+    def select(instance, *args, **kwargs):
+        if matches(instance):
+            return wrapper(instance, *args, **kwargs)
+        return original(instance, *args, **kwargs)
+    return select
@@ -0,0 +1,46 @@
+"""
+Machine readable report of chaos runs.
+
+Every act keeps the metrics collected while it was active - its duration,
+iterations of the application loop, and calls and time spent per patched
+target. With --chaos-report, they are written as JSON once the session ends.
+"""
+import json
+
+from .structure import Act, TEST_STATUS
+
+STATUS_NAMES = {
+    TEST_STATUS.SUCCESS: "passed",
+    TEST_STATUS.FAILURE: "failed",
+    TEST_STATUS.UNDEFINED: "not reached",
+    TEST_STATUS.COMPLETED: "completed",
+    TEST_STATUS.SKIPPED: "skipped",
+}
+
+
+def build_report(items):
+    """
+    Report of all acts among `items`, grouped by scenario in collection order.
+    """
+    scenarios = []
+    seen = {}
+    for item in items:
+        if not isinstance(item, Act):
+            continue
+        scenario = item.scenario
+        if id(scenario) not in seen:
+            seen[id(scenario)] = {"file": scenario.path or item.nodeid.split("::")[0], "acts": []}
+            scenarios.append(seen[id(scenario)])
+        act = {
+            "act": item.name,
+            "status": STATUS_NAMES.get(scenario.act_results.get(item.name), "not reached"),
+            "detail": scenario.act_details.get(item.name),
+        }
+        act.update(item.metrics or {})
+        seen[id(scenario)]["acts"].append(act)
+    return {"scenarios": scenarios}
+
+
+def write_report(path, items):
+    with open(path, "w") as f:
+        json.dump(build_report(items), f, indent=2, sort_keys=True)
@@ -0,0 +1,131 @@
+"""
+Resolution of dotted paths used in chaos files into objects.
+
+Supports modules, attributes nested at any depth (e.g. classes and their
+methods) and builtins. Results are kept in a LRU cache shared by every
+scenario, so each target or exception is imported once per session, when an
+act first needs it. Entry points are only located at collection - their
+module is imported once the scenario runs.
+"""
+from collections import OrderedDict
+import importlib
+import sys
+import threading
+
+from .exceptions import ResolutionError
+
+try:
+    from importlib.util import find_spec
+except ImportError:
+    find_spec = None
+
+if sys.version_info.major < 3:
+    import __builtin__ as builtins
+else:
+    import builtins
+
+CACHE_SIZE = 4096
+
+
+class LRUCache(object):
+    """
+    Thread safe mapping keeping the `maxsize` most recently used entries.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data.pop(key)
+            except KeyError:
+                return default
+            self.data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = value
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_RESOLVED = LRUCache(CACHE_SIZE)
+
+
+def resolve(path):
+    """
+    Object at dotted `path`. Names without a module are looked up in builtins.
+    """
+    root = path.split(".", 1)[0]
+    cached = _RESOLVED.get(path)
+    # Top level module got reloaded or removed - cached object is stale.
+    if cached is not None and sys.modules.get(root) is cached[0]:
+        return cached[1]
+    obj = import_path(path)
+    _RESOLVED.set(path, (sys.modules.get(root), obj))
+    return obj
+
+
+def locate(path):
+    """
+    Check that `path` is an attribute of a module that can be found, without
+    importing anything. Without importlib.util (Python 2) the path is resolved.
+    """
+    if find_spec is None:
+        resolve(path)
+        return
+    parts = path.strip().split(".")
+    if not all(parts) or len(parts) < 2:
+        raise ResolutionError(path, "not a dotted path to an attribute of a module")
+    try:
+        spec = find_spec(parts[0])
+    except (ImportError, ValueError) as e:
+        raise ResolutionError(path, "finding {} failed: {}".format(parts[0], e))
+    if spec is None:
+        raise ResolutionError(path, "no module named {}".format(parts[0]))
+
+
+def import_path(path):
+    """
+    Import the longest module prefix of `path` and walk the remaining attributes.
+    """
+    parts = path.strip().split(".")
+    if not all(parts):
+        raise ResolutionError(path, "not a dotted path")
+    for i in range(len(parts), 0, -1):
+        module_name = ".".join(parts[:i])
+        try:
+            obj = importlib.import_module(module_name)
+        except ImportError as e:
+            if not is_missing(e, module_name):
+                # Module exists, but fails to import.
+                raise ResolutionError(path, "importing {} failed: {}".format(module_name, e))
+            continue
+        for j in range(i, len(parts)):
+            try:
+                obj = getattr(obj, parts[j])
+            except AttributeError:
+                raise ResolutionError(path, "{} has no attribute {}".format(".".join(parts[:j]), parts[j]))
+        return obj
+    if len(parts) == 1 and hasattr(builtins, parts[0]):
+        return getattr(builtins, parts[0])
+    raise ResolutionError(path, "no module named {}".format(parts[0]))
+
+
+def is_missing(error, module_name):
+    """
+    Whether ImportError means `module_name` itself (or its package) doesn't exist.
+    """
+    name = getattr(error, "name", None)
+    if name is None:
+        # Python 2 only has the message.
+        return str(error).startswith("No module named")
+    return module_name == name or module_name.startswith(name + ".")
@@ -0,0 +1,179 @@
+"""
+Streaming parse of large YAML and JSON lines scenarios.
+
+Generated scenarios can hold thousands of acts. Instead of loading the whole
+document, the file is read once as a stream of YAML events and only the
+position of every act is kept. An act is loaded from its slice of the file
+when the scenario reaches it, so memory doesn't grow with the scenario's
+length. Anchors and aliases can't be resolved that way and are rejected.
+JSON lines files only need the offset of every line.
+"""
+from .cache import HEADER_KEYS
+
+
+def import_yaml():
+    """
+    PyYAML, imported once a YAML scenario needs it - sessions without one don't pay for it.
+    """
+    try:
+        import yaml
+    except ImportError:
+        yaml = None
+    assert yaml is not None, "PyYAML is required for YAML scenarios: pip install PyYAML"
+    return yaml
+
+
+class Fragment(object):
+    """
+    Position of a YAML node in a file - loaded on demand.
+
+    offset - byte offset of the node's first line
+    column - column the node starts at
+    lines - number of lines the node spans, the line it ends on included
+    end_column - column the node ends at, on its last line
+    """
+    def __init__(self, path, offset, column, lines, end_column):
+        self.path = path
+        self.offset = offset
+        self.column = column
+        self.lines = lines
+        self.end_column = end_column
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            lines = [f.readline().decode("utf8") for _ in range(self.lines)]
+        lines[-1] = lines[-1][:self.end_column]
+        # Keep the node's indentation, so block collections still line up.
+        lines[0] = " " * self.column + lines[0][self.column:]
+        return import_yaml().safe_load("".join(lines))
+
+
+class LineFragment(object):
+    """
+    Single line of a file, holding one JSON encoded act - loaded on demand.
+    """
+    def __init__(self, path, offset, loads):
+        self.path = path
+        self.offset = offset
+        self.loads = loads
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            return self.loads(f.readline())
+
+
+class LineOffsets(object):
+    """
+    Byte offsets of lines in a file, read forward only - YAML events come in file order.
+    """
+    def __init__(self, f):
+        self.file = f
+        self.line = 0
+        self.offset = 0
+
+    def of(self, line):
+        while self.line < line:
+            self.offset += len(self.file.readline())
+            self.line += 1
+        return self.offset
+
+
+def skip_node(events, first):
+    """
+    Consume events of the node starting with `first`, return its end mark.
+    """
+    yaml = import_yaml()
+    check_anchor(first)
+    if isinstance(first, (yaml.ScalarEvent, yaml.AliasEvent)):
+        return first.end_mark
+    depth = 1
+    event = first
+    while depth:
+        event = next(events)
+        check_anchor(event)
+        if isinstance(event, yaml.CollectionStartEvent):
+            depth += 1
+        elif isinstance(event, yaml.CollectionEndEvent):
+            depth -= 1
+    return event.end_mark
+
+
+def check_anchor(event):
+    yaml = import_yaml()
+    assert not isinstance(event, yaml.AliasEvent) and getattr(event, "anchor", None) is None, \
+        "Anchors and aliases are not supported in streamed scenarios (line {}).".format(event.start_mark.line + 1)
+
+
+def compile_stream(path, acts_key="acts"):
+    """
+    Compiled scenario of a YAML file, with acts left as fragments to load later.
+    """
+    yaml = import_yaml()
+    path = str(path)
+    compiled = dict((key, None) for key in HEADER_KEYS)
+    acts = []
+    with open(path, "rb") as source, open(path, "rb") as lines:
+        offsets = LineOffsets(lines)
+
+        def fragment(start, end):
+            return Fragment(path, offsets.of(start.line), start.column,
+                            end.line - start.line + 1, end.column)
+
+        events = yaml.parse(source, Loader=yaml.SafeLoader)
+        event = next(events)
+        while not isinstance(event, (yaml.MappingStartEvent, yaml.StreamEndEvent)):
+            if isinstance(event, (yaml.ScalarEvent, yaml.SequenceStartEvent)):
+                raise AssertionError("Scenario has to be a mapping.")
+            event = next(events)
+        if isinstance(event, yaml.MappingStartEvent):
+            while True:
+                key = next(events)
+                if isinstance(key, yaml.MappingEndEvent):
+                    break
+                assert isinstance(key, yaml.ScalarEvent), "Scenario keys have to be strings."
+                value = next(events)
+                if key.value == acts_key:
+                    assert isinstance(value, yaml.SequenceStartEvent), "Acts have to be a list."
+                    check_anchor(value)
+                    act = next(events)
+                    while not isinstance(act, yaml.SequenceEndEvent):
+                        end = skip_node(events, act)
+                        acts.append(fragment(act.start_mark, end))
+                        act = next(events)
+                else:
+                    end = skip_node(events, value)
+                    if key.value in HEADER_KEYS:
+                        compiled[key.value] = fragment(value.start_mark, end).load()
+
+    assert compiled["entry-point"] is not None, "Define entry point to run chaos testing."
+    compiled["acts"] = acts
+    return compiled
+
+
+def compile_lines(path, loads):
+    """
+    Compiled scenario of a JSON lines file - settings on the first line, an act per
+    every following line, left as fragments to load later.
+    """
+    path = str(path)
+    compiled = dict((key, None) for key in HEADER_KEYS)
+    acts = []
+    offset = 0
+    header = None
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                if header is None:
+                    header = loads(line)
+                    assert isinstance(header, dict), "First line has to hold the scenario's settings."
+                else:
+                    acts.append(LineFragment(path, offset, loads))
+            offset += len(line)
+
+    for key in HEADER_KEYS:
+        compiled[key] = (header or {}).get(key)
+    assert compiled["entry-point"] is not None, "Define entry point to run chaos testing."
+    compiled["acts"] = acts
+    return compiled
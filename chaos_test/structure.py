@@ -1,21 +1,37 @@
-from pytest import Item
-from werkzeug.utils import import_string, ImportStringError
+from pytest import Item, skip
+import functools
+import inspect
 import logging
+import random
+import sys
 import threading
 import time
+import traceback
 try:
     from Queue import Queue, Empty
 except ImportError as e:
     from queue import Queue, Empty
 
+from .baseline import Baseline
+from .dispatch import DispatchTable
+from .histogram import HistogramRecorder, timed_factory
+from .load import LoadGenerator
+from .patching import (PatchSet, async_support, instance_matcher, is_coroutine, raw_attribute, rewrap,
+                       select_factory, unwrap)
+from .resolver import resolve
+
 LOG = logging.getLogger(__name__)
-COMMUNICATION = Queue()
+POLL_TIMEOUT = 3
+CLOCK = getattr(time, "perf_counter", time.time)
+# Phase before the first act is active.
+WARM_UP = "warm-up"
 
 class TEST_STATUS:
     SUCCESS = 0
     FAILURE = 1
     UNDEFINED = 2
     COMPLETED = 3
+    SKIPPED = 4
 
 class SuccessfulCompletion(Exception):
     pass
@@ -23,43 +39,89 @@ class SuccessfulCompletion(Exception):
 class Scenario(object):
     """
     Scenario - a sequence of acts.
+
+    Every scenario owns its communication channel, so actors of different
+    scenarios never see each other's messages.
     """
-    def __init__(self, parent, app_factory, monkeypatch, acts, global_next=None):
+    def __init__(self, parent, app_factory, monkeypatch, acts, global_next=None, timeout=None,
+                 iteration_point=None, dispatch=False, load=None, histograms=None, warm_up=None,
+                 baseline=None):
         self.acts = []
         self.act_results = {}
+        self.act_details = {}
         self.current_act = 0
         self.starting_point = None
         self.exit_point     = None
         self.success_criteria = None
         self.parent = parent
+        # Node id of the file (or generated sequence) the scenario comes from.
+        self.path = None
         self.global_next = global_next
-
+        self.timeout = parse_timeout(timeout)
+        self.iteration_point = iteration_point
+        self.iterations = ActorStats()
+        self.dispatch = dispatch
+        self.table = None
+        self.load = LoadGenerator(load) if load else None
+        self.histograms = HistogramRecorder(histograms) if histograms else None
+        self.warm_up = parse_duration(warm_up, "warm-up")
+        self.baseline = Baseline(baseline) if baseline is not None else None
+        # Next-point calls outside of acts, for baselines lasting a number of calls.
+        self.next_calls = ActorStats()
+        self.channel = Queue()
+        self.started = False
+
+        # Callable, or its dotted path - resolved once the application starts.
         self.app_factory = app_factory
-        self.monkeypatch = monkeypatch.MonkeyPatch()
+        # Serializes applying and reverting of the acts' patch sets.
+        self.patch_lock = threading.Lock()
+        # Patches living for the whole run, underneath the acts' ones.
+        self.instrumentation = monkeypatch.MonkeyPatch()
 
         for i, act in enumerate(acts):
-            if hasattr(Act, "from_parent"):
-                self.add_act(Act.from_parent(self.parent, name="act-{}".format(i),
-                                scenario=self, act_info=act, last=(i == len(acts)-1)))
-            else:
-                self.add_act(Act(name="act-{}".format(i), parent=self.parent, scenario=self, 
-                    act_info=act, last=(i==len(acts)-1) ))
-    
+            self.add_act(self.create_act("act-{}".format(i), act, last=(i == len(acts)-1)))
+
+    def create_act(self, name, act_info, last):
+        if hasattr(Act, "from_parent"):
+            return Act.from_parent(self.parent, name=name, scenario=self, act_info=act_info, last=last)
+        return Act(name=name, parent=self.parent, scenario=self, act_info=act_info, last=last)
+
     def add_act(self, act):
         self.acts.append(act)
         self.act_results[act.name] = TEST_STATUS.UNDEFINED
+
+    def record(self, act_name, status, detail=None):
+        self.act_results[act_name] = status
+        if detail:
+            self.act_details[act_name] = detail
     
     def next_test(self):
         """
         Label current act as a success and proceed to next test by removing current patches
         and activating next act.
         """
-        self.act_results[self.acts[self.current_act].name] = TEST_STATUS.SUCCESS
-        self.monkeypatch.undo()
+        self.acts[self.current_act].collect()
+        over_budget = self.acts[self.current_act].check_budgets()
+        if over_budget:
+            # The application recovered, just not well enough - later acts still run.
+            self.record(self.acts[self.current_act].name, TEST_STATUS.FAILURE, over_budget)
+        else:
+            self.record(self.acts[self.current_act].name, TEST_STATUS.SUCCESS)
+        self.acts[self.current_act].deactivate()
+        self.acts[self.current_act].release()
         self.current_act += 1
         if self.current_act == len(self.acts):
             return TEST_STATUS.COMPLETED
-        self.acts[self.current_act].activate(self.monkeypatch)
+        act = self.acts[self.current_act]
+        try:
+            act.activate()
+        except Exception:
+            # E.g. a streamed act with an invalid definition - fail it and stop driving the app.
+            act.deactivate()
+            self.restore()
+            self.record(act.name, TEST_STATUS.FAILURE,
+                        "Act could not be activated:\n{}".format(traceback.format_exc()))
+            return TEST_STATUS.FAILURE
 
     def runtest(self, act_name):
         """
@@ -73,57 +135,248 @@ class Scenario(object):
         Mocked values will communicate to queue if they have succeeded or not.
         New mocks happen automatically in different thread. We can just read the results.
         """
-        if self.current_act > 0:
-            return self.act_results[act_name]
+        if not self.started:
+            self.run()
+        return self.act_results[act_name]
 
-        self.acts[0].activate(self.monkeypatch)
+    def run(self):
+        """
+        Run the application through every act, recording results as acts complete.
+        """
+        self.started = True
+        thread = None
+        try:
+            self.instrument()
+            if self.dispatch:
+                self.table = DispatchTable(self.acts, self.patch_lock)
+                self.table.apply()
+            if self.warm_up or self.baseline is not None:
+                # The application runs without chaos first - the phase acts are compared with.
+                thread = self.start_app()
+                if self.warm_up:
+                    thread.join(self.warm_up)
+                if self.baseline is not None:
+                    self.baseline.measure(self, thread, time.time() + self.timeout if self.timeout else None)
+                self.acts[0].activate()
+            else:
+                self.acts[0].activate()
+                thread = self.start_app()
+        except Exception:
+            # E.g. an act raising an exception that can't be imported - nothing of the
+            # run may outlive the scenario.
+            self.acts[0].deactivate()
+            self.restore()
+            self.record(self.acts[0].name, TEST_STATUS.FAILURE,
+                        "Scenario could not be started:\n{}".format(traceback.format_exc()))
+            if thread is not None:
+                self.stop_app(thread)
+            return
         exit_cond = False
-        thread = threading.Thread(target=self.app_factory())
-        # thread.daemon = True
-        thread.start()
-        while not COMMUNICATION.empty() or (thread.isAlive() and not exit_cond):
+        started_at = time.time()
+        scenario_deadline = started_at + self.timeout if self.timeout else None
+        act_deadline = self.acts[0].deadline(started_at)
+        self.prepare_next()
+        while not exit_cond and (not self.channel.empty() or thread.is_alive()):
+            wait = POLL_TIMEOUT
+            deadlines = [d for d in (scenario_deadline, act_deadline) if d is not None]
+            if deadlines:
+                wait = min(deadlines) - time.time()
+                if wait <= 0 and self.channel.empty():
+                    self.expire(thread)
+                    return
+                wait = max(0, min(wait, POLL_TIMEOUT))
             try:
-                comm = COMMUNICATION.get(block=True, timeout=3)
+                comm = self.channel.get(block=True, timeout=wait)
             except Empty:
                 continue
-            exit_cond = False
             if comm["COMMAND"] == "NEXT":
-                res = self.next_test()
+                if comm["ACT"] != self.acts[self.current_act].name:
+                    # Another thread reached the next-point of an act that is already over.
+                    release_handoff(comm)
+                    continue
+                try:
+                    res = self.next_test()
+                finally:
+                    # Release the app thread waiting inside next-point.
+                    release_handoff(comm)
+                self.prepare_next()
                 if res and res == TEST_STATUS.COMPLETED:
                     exit_cond = True
                     continue
-                comm = COMMUNICATION.get(block=True, timeout=3)
-            elif comm["COMMAND"] == "RAISED":
-                self.acts[self.current_act].history[comm["ORIGIN"]] = True
+                if res == TEST_STATUS.FAILURE:
+                    self.stop_app(thread)
+                    return
+                act_deadline = self.acts[self.current_act].deadline(time.time())
             
         if not exit_cond:
-            self.act_results[self.current_act] = TEST_STATUS.FAILURE
-        
-        assert not thread.isAlive()
-        return self.act_results[act_name]
+            self.acts[self.current_act].collect()
+            self.record(self.acts[self.current_act].name, TEST_STATUS.FAILURE)
+
+        # Last next-point exits the application right after reporting.
+        thread.join(POLL_TIMEOUT)
+        self.restore()
+        assert not thread.is_alive()
+
+    def start_app(self):
+        thread = threading.Thread(target=self.app_target())
+        # Application that missed its deadline keeps running - don't let it block the session exit.
+        thread.daemon = True
+        thread.start()
+        if self.load is not None:
+            self.load.start()
+        return thread
+
+    def stop_app(self, thread):
+        """
+        Make the application exit at its next next-point call - once chaos is over it
+        must not keep running through the rest of the session.
+        """
+        next_point = self.global_next or self.acts[self.current_act].next_point
+        if not next_point or not thread.is_alive():
+            return
+        path = next_point.strip().split(".")
+        source = resolve(".".join(path[:-1]))
+        original = getattr(source, path[-1])
+        factory = async_support().stop_factory if is_coroutine(original) else stop_factory
+        self.instrumentation.setattr(source, path[-1], factory(original, thread))
+        thread.join(POLL_TIMEOUT)
+        self.instrumentation.undo()
+
+    def prepare_next(self):
+        """
+        Prepare the act after the current one while the application runs, so
+        the transition only swaps the batches.
+        """
+        following = self.current_act + 1
+        if self.table is None and following < len(self.acts) and self.acts[following].patches is None:
+            try:
+                self.acts[following].prepare(self.acts[self.current_act].patches)
+            except Exception:
+                # Raised again, and reported, once the act is activated.
+                LOG.debug("Preparing %s failed", self.acts[following].name, exc_info=True)
 
+    def restore(self):
+        """
+        Release threads waiting on transitions that will never be made, stop the
+        load, and remove patches living for the whole run.
+        """
+        # Load workers may be among them - stopping the load waits for them.
+        while True:
+            try:
+                release_handoff(self.channel.get_nowait())
+            except Empty:
+                break
+        if self.load is not None:
+            self.load.stop()
+        if self.table is not None:
+            self.table.revert()
+        self.instrumentation.undo()
+
+    def instrument(self):
+        """
+        Count calls of the iteration-point, if there is one, and of the next-point
+        for the baseline. Time calls of targets with histograms.
+        """
+        if self.iteration_point:
+            path = self.iteration_point.strip().split(".")
+            source = resolve(".".join(path[:-1]))
+            original = getattr(source, path[-1])
+            factory = async_support().count_factory if is_coroutine(original) else count_factory
+            self.instrumentation.setattr(source, path[-1], factory(original, self.iterations))
+        if self.baseline is not None and self.baseline.calls is not None:
+            assert self.global_next, "Baseline lasting a number of calls needs a global next-point."
+            path = self.global_next.strip().split(".")
+            source = resolve(".".join(path[:-1]))
+            original = getattr(source, path[-1])
+            factory = async_support().count_factory if is_coroutine(original) else count_factory
+            self.instrumentation.setattr(source, path[-1], factory(original, self.next_calls))
+        if self.histograms is not None:
+            for target in self.histograms.targets:
+                path = target.split(".")
+                source = resolve(".".join(path[:-1]))
+                raw = raw_attribute(source, path[-1])
+                original = unwrap(raw)
+                factory = async_support().timed_factory if is_coroutine(original) else timed_factory
+                self.instrumentation.setattr(
+                    source, path[-1], rewrap(raw, factory(original, self.histograms.slots[target])))
+            self.histograms.switch(WARM_UP)
+
+    def app_target(self):
+        """
+        Callable the application thread runs - coroutine entry points get their own event loop.
+        """
+        factory = self.app_factory if callable(self.app_factory) else resolve(self.app_factory)
+        main = factory()
+        if is_coroutine(main):
+            return functools.partial(async_support().run, main)
+        return main
 
-class Act(Item):
+    def expire(self, thread):
+        """
+        Deadline passed - fail the current act with the application's stack, and
+        stop the application. One stuck away from the next-point is left running
+        as a daemon thread.
+        """
+        act = self.acts[self.current_act]
+        act.collect()
+        stack = dump_stack(thread)
+        LOG.error("Chaos act %s missed its deadline, application stack:\n%s", act.name, stack)
+        self.record(act.name, TEST_STATUS.FAILURE, "Deadline expired. Application stack:\n{}".format(stack))
+        act.deactivate()
+        self.restore()
+        self.stop_app(thread)
+
+
+class Stage(object):
     """
-    Act - tests before next act.
+    Stage - definition of an act: its actors and the point that ends it.
+    Shared by collected Act items and acts replayed in isolated workers.
 
     exit_point - function that tells Scenario to switch to the next Act
     actors - list of points to mock
+    timeout - seconds the act may take before it is failed
+    max_recovery - seconds allowed from the first raised exception to the next-point
+    min_throughput - iterations per second the application has to keep up during the act
     """
-    def __init__(self, name=None, parent=None, scenario=None, act_info=None, last=False):
-        super(Act, self).__init__(name, parent)
+    SETTINGS = ("timeout", "max-recovery-ms", "min-throughput")
+
+    def setup_stage(self, name, scenario, act_info, last):
         self.history = {}
+        self.metrics = None
+        self.started_at = None
+        self.iterations_at = 0
         self.name = name
         self.scenario = scenario
         self.entry_point = None
         self.exit_point = None
         self.last = last
-        self.next_point = self.parse_next_point(act_info) or scenario.global_next
+        self.timeout = None
+        self.max_recovery = None
+        self.min_throughput = None
+        self.next_point = None
+        self.actors = None
+        self.patches = None
+        # Streamed acts are only loaded once the scenario reaches them.
+        self.streamed = hasattr(act_info, "load")
+        self.source = act_info if self.streamed else None
+        if self.source is None:
+            self.materialize(act_info)
+
+    def materialize(self, act_info):
+        assert isinstance(act_info, dict), "Every act has to be a mapping of actors."
+        self.timeout = parse_timeout(act_info.get("timeout"))
+        max_recovery = parse_budget(act_info, "max-recovery-ms")
+        self.max_recovery = max_recovery / 1000.0 if max_recovery is not None else None
+        self.min_throughput = parse_budget(act_info, "min-throughput")
+        assert self.min_throughput is None or self.scenario.iteration_point, \
+            "min-throughput needs an iteration-point to count iterations."
+        self.next_point = self.parse_next_point(act_info) or self.scenario.global_next
         assert self.next_point, "Without global next-point, there needs to be one defined per scenario."
         self.add_next_point(act_info, self.next_point)
 
         self.actors = self.parse_actors(self, act_info, self.last)
-    
+        self.source = None
+
     @staticmethod
     def add_next_point(data, next_point):
         if not data.get('next-point'):
@@ -138,43 +391,264 @@ class Act(Item):
         actors = []
         for actor in data:
             LOG.debug(actor)
+            if actor in Stage.SETTINGS:
+                continue
             if actor == 'next-point':
                 if not last_act:
                     actors.append(NextActor(act, actor, data[actor]))
                 else:
                     actors.append(LastActor(act, actor, data[actor]))
+            elif data[actor] and DelayActor.ACTOR_EXEC in data[actor][0]:
+                actors.append(DelayActor(act, actor, data[actor]))
             else:
                 actors.append(Actor(act, actor, data[actor]))
         return actors
 
-    def activate(self, monkeypatch):
+    def prepare(self, below=None):
+        """
+        Build replacements of all targets, ready to be applied as one batch.
+        below - patch set that is reverted before this act's set is applied
+        """
+        if self.source is not None:
+            self.materialize(self.source.load())
+        patches = PatchSet(self.scenario.patch_lock, below)
         for actor in self.actors:
-            self.history[actor.source.__name__] = False
-            actor.activate(monkeypatch)
-    
+            actor.resolve()
+            actor.prepare(patches)
+        self.patches = patches
+
+    def activate(self):
+        table = self.scenario.table
+        if table is None and self.patches is None:
+            self.prepare()
+        for actor in self.actors:
+            self.history[actor.target] = False
+        if table is None:
+            self.patches.apply()
+        else:
+            table.switch(self)
+        self.iterations_at = self.scenario.iterations.calls
+        self.started_at = CLOCK()
+        if self.scenario.load is not None:
+            self.scenario.load.switch(self.name)
+        if self.scenario.histograms is not None:
+            self.scenario.histograms.switch(self.name)
+
+    def deactivate(self):
+        if self.scenario.table is not None:
+            self.scenario.table.switch(None)
+        elif self.patches is not None:
+            self.patches.revert()
+
+    def release(self):
+        """
+        Drop actors and patches of a streamed act once it is over - only its metrics
+        and history are kept, so memory doesn't grow with the number of acts reached.
+        """
+        if self.streamed and self.scenario.table is None:
+            self.actors = None
+            self.patches = None
+
+    def collect(self):
+        """
+        Read actors' counters into history and metrics - called once the act is over.
+        """
+        duration = CLOCK() - self.started_at
+        iterations = None
+        if self.scenario.iteration_point:
+            iterations = self.scenario.iterations.calls - self.iterations_at
+        self.metrics = {
+            "duration": duration,
+            "iterations": iterations,
+            "throughput": iterations / duration if iterations is not None and duration > 0 else None,
+            "recovery": self.recovery(),
+            "load": self.scenario.load.collect(self.name) if self.scenario.load is not None else None,
+            "targets": {},
+        }
+        histograms = self.scenario.histograms
+        if histograms is not None:
+            self.metrics["histograms"] = histograms.summary(self.name)
+            self.metrics[WARM_UP] = histograms.summary(WARM_UP)
+        baseline = self.scenario.baseline
+        if baseline is not None:
+            self.metrics["baseline"] = baseline.summary
+            self.metrics["ratios"] = baseline.ratios(self.metrics)
+        for actor in self.actors:
+            self.history[actor.target] = actor.stats.hits > 0
+            self.metrics["targets"][actor.target] = {
+                "kind": actor.KIND,
+                "calls": actor.stats.calls,
+                "hits": actor.stats.hits,
+                "elapsed": actor.stats.elapsed,
+                "delayed": actor.stats.delayed,
+            }
+
+    def recovery(self):
+        """
+        Seconds from the first raised exception to the next-point call, None if
+        nothing was raised or the next-point wasn't reached.
+        """
+        raised = [actor.stats.first_hit for actor in self.actors
+                  if actor.KIND == Actor.KIND and actor.stats.first_hit is not None]
+        reached = [actor.stats.first_hit for actor in self.actors if actor.KIND == NextActor.KIND]
+        if not raised or not reached or reached[0] is None:
+            return None
+        return reached[0] - min(raised)
+
+    def check_budgets(self):
+        """
+        Why the collected metrics break the act's budgets, None if they don't.
+        """
+        problems = []
+        recovery = self.metrics["recovery"]
+        if self.max_recovery is not None and recovery is not None and recovery > self.max_recovery:
+            problems.append("Recovery took {:.1f}ms, max-recovery-ms is {:g}.".format(
+                recovery * 1000, self.max_recovery * 1000))
+        throughput = self.metrics["throughput"] or 0
+        if self.min_throughput is not None and throughput < self.min_throughput:
+            problems.append("Throughput was {:.1f}/s, min-throughput is {:g}.".format(
+                throughput, self.min_throughput))
+        return " ".join(problems) or None
+
+    def metrics_report(self):
+        """
+        Human readable metrics of the act, None if it never ran.
+        """
+        if not self.metrics:
+            return None
+        lines = ["Act duration: {:.3f}s".format(self.metrics["duration"])]
+        if self.metrics["iterations"] is not None:
+            lines.append("Iterations: {} ({:.1f}/s)".format(
+                self.metrics["iterations"], self.metrics["throughput"] or 0))
+        if self.metrics.get("recovery") is not None:
+            lines.append("Recovery: {:.1f}ms".format(self.metrics["recovery"] * 1000))
+        load = self.metrics.get("load")
+        if load:
+            lines.append("Load: {} requests, {} errors".format(load["requests"], load["errors"]))
+            if load["requests"]:
+                lines.append("Load latency: p50 {:.3f}ms, p90 {:.3f}ms, p99 {:.3f}ms, max {:.3f}ms".format(
+                    load["p50"] * 1000, load["p90"] * 1000, load["p99"] * 1000, load["max"] * 1000))
+        lines.append("{:<40} {:>10} {:>10} {:>12}".format("target", "calls", "hits", "time"))
+        latency = []
+        for target, stats in sorted(self.metrics["targets"].items()):
+            lines.append("{:<40} {:>10} {:>10} {:>11.6f}s".format(
+                target, stats["calls"], stats["hits"], stats["elapsed"]))
+            if stats["kind"] == DelayActor.KIND:
+                latency.append("{}: {:.3f}s added over {} delayed calls ({} calls in total)".format(
+                    target, stats["delayed"], stats["hits"], stats["calls"]))
+        if latency:
+            lines.append("Injected latency")
+            lines.extend(latency)
+        if self.metrics.get("histograms"):
+            lines.append("{:<40} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+                "latency", "calls", "p50", "p99", "p999", "max"))
+            warm_up = self.metrics.get(WARM_UP) or {}
+            for target, summary in sorted(self.metrics["histograms"].items()):
+                lines.append(histogram_line(target, summary))
+                if target in warm_up:
+                    lines.append(histogram_line("  " + WARM_UP, warm_up[target]))
+        if self.metrics.get("ratios"):
+            lines.extend(ratio_lines(self.metrics["baseline"], self.metrics["ratios"]))
+        return "\n".join(lines)
+
+    def deadline(self, now):
+        if self.timeout:
+            return now + self.timeout
+        return None
+
+
+class Act(Stage, Item):
+    """
+    Act - tests before next act.
+    """
+    def __init__(self, name=None, parent=None, scenario=None, act_info=None, last=False):
+        super(Act, self).__init__(name, parent)
+        self.setup_stage(name, scenario, act_info, last)
+
     def runtest(self):
         current_act_success = self.scenario.runtest(self.name)
+        report = self.metrics_report()
+        if report:
+            self.add_report_section("call", "chaos", report)
         if current_act_success == TEST_STATUS.SUCCESS:
             assert True
         elif current_act_success == TEST_STATUS.UNDEFINED:
             assert False, "Test wasn't reached due to previously failed test."
         elif current_act_success == TEST_STATUS.FAILURE:
+            detail = self.scenario.act_details.get(self.name)
+            if detail:
+                assert False, "Act was not completed. {}".format(detail)
             assert False, "Act was not completed."
+        elif current_act_success == TEST_STATUS.SKIPPED:
+            skip(self.scenario.act_details.get(self.name, "Act was skipped."))
+
+class ActorStats(object):
+    """
+    Counters updated by the injected wrapper, read by the runner at act boundaries.
+    Increments aren't locked - concurrent callers may undercount, but never
+    report a hit that didn't happen.
+
+    calls - times the patched target was called
+    hits - times the wrapper acted (raised, delayed, or reported next-point)
+    elapsed - seconds spent in the wrapper, the original included. Not kept for
+              next-points, their original runs once the act is already over.
+    delayed - seconds of latency injected
+    first_hit - clock reading of the first hit, None until there is one
+    """
+    __slots__ = ("calls", "hits", "elapsed", "delayed", "first_hit")
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.elapsed = 0.0
+        self.delayed = 0.0
+        self.first_hit = None
+
 
 class BaseActor(object):
+    KIND = None
+
     def __init__(self, act):
         self.act = act
+        self.stats = ActorStats()
+        self.matches = None
+
+    def resolve(self):
+        """
+        Import everything the actor patches - done on first activation, not at collection.
+        """
+        pass
     
-    def activate(self, monkeypatch):
-        raise NotImplementedError("To be a proper actor you need to activate monkeypatches")
+    def prepare(self, patches):
+        raise NotImplementedError("To be a proper actor you need to prepare patches")
+
+    def patch(self, patches, build):
+        """
+        Add the wrapper `build` makes around the target's current function to `patches`,
+        keeping the kind of descriptor and applying the instance filter.
+        """
+        raw = patches.current(self.source, self.source_attr)
+        original = unwrap(raw)
+        wrapper = build(original)
+        if self.matches is not None:
+            assert inspect.isclass(self.source) and not isinstance(raw, (staticmethod, classmethod)), \
+                "Instance filters need a method or property of a class: {}".format(self.target)
+            factory = async_support().select_factory if is_coroutine(original) else select_factory
+            wrapper = factory(wrapper, original, self.matches)
+        patches.add(self.source, self.source_attr, rewrap(raw, wrapper))
 
 class Actor(BaseActor):
     """
     Actor is an element - a class or a function involved in an Act.
     There are functions or classes that get monkeypatched to run the test.
+
+    By default every call raises. With `chance` (percent) and/or `rate` (raises
+    per second) only some calls raise, the rest call the original. `seed` makes
+    the random choices repeatable.
     """
 
     ACTOR_EXEC = 'exc'
+    KIND = 'raise'
 
     def __init__(self, act, source, sub):
         super(Actor, self).__init__(act)
@@ -184,33 +658,110 @@ class Actor(BaseActor):
         assert len(sub) == 1, "Only 1 substitution per act available for the same method"
         sub = sub[0]
 
-        self.source = import_string(".".join(path[:-1]))
+        self.target = source.strip()
+        self.source_path = ".".join(path[:-1])
         self.source_attr = path[-1]
-        try:
-            self.sub = import_string(sub.get(self.ACTOR_EXEC).split(',')[0].strip())
-        except ImportStringError as e:
-            import sys
-            if sys.version_info.major < 3:
-                import __builtin__ as builtins
-            else:
-                import builtins
-            attempt = getattr(builtins, sub.get(
-                self.ACTOR_EXEC).split(',')[0].strip())
-            if not attempt:
-                raise e
-            self.sub = attempt
+        self.source = None
+
+        self.chance = sub.get('chance')
+        self.rate = sub.get('rate')
+        self.seed = sub.get('seed')
+        self.where = sub.get('where')
+        self.filter_path = sub.get('instance-filter')
+        if self.where is not None:
+            assert isinstance(self.where, dict), "where is a mapping of instance attributes to their values."
+        if self.chance is not None:
+            assert 0 < self.chance <= 100, "chance is a percentage of calls that act, (0, 100]."
+        if self.rate is not None:
+            assert self.rate > 0, "rate is a positive number of calls per second."
+        self.parse_sub(sub)
+
+    def parse_sub(self, sub):
+        self.sub_path = sub.get(self.ACTOR_EXEC).split(',')[0].strip()
+        self.sub = None
         extra_msg = sub.get(self.ACTOR_EXEC).split(',')[1:]
         if len(extra_msg) == 0:
             self.sub_message = ["Actor raises an error {}".format(sub.get(self.ACTOR_EXEC).split(',')[0])]
         else:
             self.sub_message = extra_msg
+
+    def resolve(self):
+        if self.source is None:
+            self.source = resolve(self.source_path)
+            self.sub = resolve(self.sub_path)
+            self.resolve_filter()
+
+    def resolve_filter(self):
+        if self.where is not None or self.filter_path is not None:
+            predicate = resolve(self.filter_path) if self.filter_path is not None else None
+            self.matches = instance_matcher(self.where, predicate)
     
-    def activate(self, monkeypatch):
-        monkeypatch.setattr(self.source, self.source_attr, raise_factory(self.sub, self.sub_message))
+    def prepare(self, patches):
+        def build(original):
+            factory = async_support().raise_factory if is_coroutine(original) else raise_factory
+            return factory(self.sub, self.sub_message, self.stats,
+                           original, trigger_factory(self.chance, self.rate, self.seed), patches.gate)
+        self.patch(patches, build)
+
+
+class DelayActor(Actor):
+    """
+    Actor that slows the target down instead of raising.
+
+    delay - seconds, or a table with `distribution`: `fixed` (`value`),
+            `uniform` (`low`, `high`) or `lognormal` (`mu`, `sigma`)
+    call-original - whether the original runs after the delay, true by default
+    """
+
+    ACTOR_EXEC = 'delay'
+    KIND = 'delay'
+    DISTRIBUTIONS = {
+        "fixed": ("value",),
+        "uniform": ("low", "high"),
+        "lognormal": ("mu", "sigma"),
+    }
+
+    def parse_sub(self, sub):
+        delay = sub.get(self.ACTOR_EXEC)
+        if not isinstance(delay, dict):
+            delay = {"distribution": "fixed", "value": delay}
+        self.distribution = delay.get("distribution", "fixed")
+        assert self.distribution in self.DISTRIBUTIONS, \
+            "delay distribution has to be one of: {}".format(", ".join(sorted(self.DISTRIBUTIONS)))
+        self.parameters = []
+        for name in self.DISTRIBUTIONS[self.distribution]:
+            assert isinstance(delay.get(name), (int, float)), \
+                "{} delay needs a numeric {}".format(self.distribution, name)
+            self.parameters.append(delay[name])
+        if self.distribution != "lognormal":
+            assert min(self.parameters) >= 0, "delay can't be negative."
+        self.call_original = sub.get("call-original", True)
+
+    def resolve(self):
+        if self.source is None:
+            self.source = resolve(self.source_path)
+            self.resolve_filter()
+
+    def sampler(self):
+        if self.distribution == "fixed":
+            value = float(self.parameters[0])
+            return lambda: value
+        rng = derived_random(self.seed, "delay")
+        if self.distribution == "uniform":
+            return functools.partial(rng.uniform, *self.parameters)
+        return functools.partial(rng.lognormvariate, *self.parameters)
+
+    def prepare(self, patches):
+        def build(original):
+            factory = async_support().delay_factory if is_coroutine(original) else delay_factory
+            return factory(self.sampler(), self.stats, original, self.call_original,
+                           trigger_factory(self.chance, self.rate, self.seed), patches.gate)
+        self.patch(patches, build)
 
 
 class NextActor(BaseActor):
     ACTOR_EXEC = 'exc'
+    KIND = 'next-point'
 
     def __init__(self, act, source, sub):
         super(NextActor, self).__init__(act)
@@ -221,61 +772,217 @@ class NextActor(BaseActor):
             source = sub.get(self.ACTOR_EXEC)
         path = source.strip().split(".")
 
-        self.original_method = import_string(source)
-        self.source = import_string(".".join(path[:-1]))
+        self.target = source.strip()
+        self.source_path = ".".join(path[:-1])
         self.source_attr = path[-1]
+        self.original_method = None
+        self.source = None
 
+    def resolve(self):
+        if self.source is None:
+            self.original_method = resolve(self.target)
+            self.source = resolve(self.source_path)
 
-    def activate(self, monkeypatch):
-        monkeypatch.setattr(self.source, self.source_attr, next_factory(self.original_method, self.act))
+    def prepare(self, patches):
+        # Current attribute, not the resolved one - it may be wrapped by instrumentation.
+        def build(original):
+            factory = async_support().next_factory if is_coroutine(original) else next_factory
+            return factory(original, self.act, self.act.scenario.channel, self.stats, patches.gate)
+        self.patch(patches, build)
 
 
 class LastActor(NextActor):
     """
     Last NextActor that submits next and exits the application.
     """
-    def activate(self, monkeypatch):
-        monkeypatch.setattr(self.source, self.source_attr, last_factory(self.act))
+    def prepare(self, patches):
+        def build(original):
+            factory = async_support().last_factory if is_coroutine(original) else last_factory
+            return factory(self.act, self.act.scenario.channel, self.stats, original, patches.gate)
+        self.patch(patches, build)
+
+
+def parse_timeout(timeout):
+    return parse_duration(timeout, "timeout")
+
+
+def parse_duration(duration, name):
+    if duration is None:
+        return None
+    assert isinstance(duration, (int, float)) and not isinstance(duration, bool) and duration > 0, \
+        "{} has to be a positive number of seconds.".format(name)
+    return float(duration)
+
+
+def histogram_line(label, summary):
+    values = [summary[name] for name in ("p50", "p99", "p999", "max")]
+    return "{:<40} {:>10} ".format(label, summary["count"]) + " ".join(
+        "{:>10}".format("-" if value is None else "{:.3f}ms".format(value * 1000)) for value in values)
+
+
+def ratio_lines(baseline, ratios):
+    lines = ["Compared with baseline ({} windows)".format(baseline["windows"])]
+    if baseline["throughput"] is not None:
+        lines.append("throughput: {} of {:.1f}/s".format(format_ratio(ratios["throughput"]),
+                                                        baseline["throughput"]))
+    for target, latency in sorted(ratios["latency"].items()):
+        lines.append("{} latency: p50 {}, p99 {}".format(
+            target, format_ratio(latency["p50"]), format_ratio(latency["p99"])))
+    return lines
+
+
+def format_ratio(value):
+    return "-" if value is None else "{:.2f}x".format(value)
+
+
+def parse_budget(act_info, key):
+    budget = act_info.get(key)
+    if budget is None:
+        return None
+    assert isinstance(budget, (int, float)) and not isinstance(budget, bool) and budget > 0, \
+        "{} has to be a positive number.".format(key)
+    return float(budget)
+
+
+def release_handoff(comm):
+    """
+    Let the thread that sent `comm` out of its next-point.
+    """
+    if comm.get("HANDOFF"):
+        comm["HANDOFF"].set()
 
 
-def raise_factory(exc, message):
+def dump_stack(thread):
+    frame = sys._current_frames().get(thread.ident)
+    if frame is None:
+        return "<thread has finished>"
+    return "".join(traceback.format_stack(frame))
+
+
+def derived_random(seed, purpose):
+    """
+    Random stream of its own for `purpose`, repeatable with `seed` - streams drawn
+    with the same seed for different purposes aren't correlated.
+    """
+    if seed is None:
+        return random.Random()
+    return random.Random("{}:{}".format(seed, purpose))
+
+
+def trigger_factory(chance=None, rate=None, seed=None):
+    """
+    Decides whether a call should raise. None means every call does.
+    """
+    if chance is None and rate is None:
+        return None
+    threshold = chance / 100.0 if chance is not None else None
+    interval = 1.0 / rate if rate is not None else None
+    draw = random.Random(seed).random
+    clock = getattr(time, "monotonic", time.time)
+    next_fire = [0.0]
+
+    def trigger():
+        if threshold is not None and draw() >= threshold:
+            return False
+        if interval is not None:
+            now = clock()
+            if now < next_fire[0]:
+                return False
+            next_fire[0] = now + interval
+        return True
+    return trigger
+
+
+def raise_factory(exc, message, stats, original=None, trigger=None, gate=None):
     def raise_exception(*args, **kwargs):
-        COMMUNICATION.put(
-            {
-                "COMMAND": "RAISED",
-                "ORIGIN": exc.__name__
-            }
-        )
-        raise exc(*message)
+        if gate is not None and not gate.active:
+            return original(*args, **kwargs)
+        stats.calls += 1
+        start = CLOCK()
+        try:
+            if trigger is not None and not trigger():
+                return original(*args, **kwargs)
+            stats.hits += 1
+            if stats.first_hit is None:
+                stats.first_hit = start
+            raise exc(*message)
+        finally:
+            stats.elapsed += CLOCK() - start
     return raise_exception
 
+def delay_factory(sample, stats, original, call_original=True, trigger=None, gate=None):
+    def delay(*args, **kwargs):
+        if gate is not None and not gate.active:
+            return original(*args, **kwargs)
+        stats.calls += 1
+        start = CLOCK()
+        try:
+            if trigger is None or trigger():
+                stats.hits += 1
+                pause = sample()
+                stats.delayed += pause
+                time.sleep(pause)
+            if call_original:
+                return original(*args, **kwargs)
+        finally:
+            stats.elapsed += CLOCK() - start
+    return delay
+
+def count_factory(original, stats):
+    def count(*args, **kwargs):
+        stats.calls += 1
+        return original(*args, **kwargs)
+    return count
+
+def stop_factory(original, thread):
+    def stop(*args, **kwargs):
+        if threading.current_thread() is thread:
+            sys.exit(0)
+        return original(*args, **kwargs)
+    return stop
+
 def exit_factory():
     raise SuccessfulCompletion("Completed the whole method")
 
-def next_factory(next_method, act):
+def next_factory(next_method, act, channel, stats, gate=None):
+    # Threads reaching the next-point during the act all wait for the one transition.
+    lock = threading.Lock()
+    pending = []
+
     def next_act(*args, **kwargs):
-        COMMUNICATION.put(
-            {
-                "COMMAND": "NEXT",
-                "ACT": act.name
-            }
-        )
-        # This way Queue won't become empty until next-processed gets 
-        COMMUNICATION.put(
-            {
-                "COMMAND": "NEXT-PROCESSED",
-                "ACT": act.name
-            }
-        )
-        # Wait until next is processed and monkeypatches are adjusted
-        while not COMMUNICATION.empty():
-            time.sleep(0.5)
-        next_method()
+        if gate is not None and not gate.active:
+            return next_method(*args, **kwargs)
+        stats.calls += 1
+        stats.hits += 1
+        if stats.first_hit is None:
+            stats.first_hit = CLOCK()
+        with lock:
+            first = not pending
+            if first:
+                pending.append(threading.Event())
+            handoff = pending[0]
+        if first:
+            channel.put(
+                {
+                    "COMMAND": "NEXT",
+                    "ACT": act.name,
+                    "HANDOFF": handoff
+                }
+            )
+        # Block until the runner has swapped the patches for the next act.
+        handoff.wait()
+        return next_method(*args, **kwargs)
     return next_act
 
-def last_factory(act):
+def last_factory(act, channel, stats, original=None, gate=None):
     def next_act(*args, **kwargs):
-        COMMUNICATION.put(
+        if gate is not None and not gate.active:
+            return original(*args, **kwargs)
+        stats.calls += 1
+        stats.hits += 1
+        if stats.first_hit is None:
+            stats.first_hit = CLOCK()
+        channel.put(
             {
                 "COMMAND": "NEXT",
                 "ACT": act.name
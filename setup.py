@@ -6,7 +6,6 @@ with open("README.md", "r") as fh:
 dependencies = [
     "PyYAML",
     "toml",
-    "Werkzeug",
     "pytest"
 ]
 
@@ -21,6 +20,9 @@ setuptools.setup(
     url="https://github.com/qporest/pytest-exception-script",
     packages=setuptools.find_packages(),
     install_requires=dependencies,
+    extras_require={
+        "fast-json": ["orjson; python_version >= '3.6'"],
+    },
     tests_require=dependencies,
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,103 @@
+from chaos_test import TomlChaosFile
+from chaos_test import cache
+from chaos_test.cache import load_scenario
+import json
+import os
+import pytest
+
+
+class FakeCache(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default):
+        return json.loads(self.data[key]) if key in self.data else default
+
+    def set(self, key, value):
+        self.data[key] = json.dumps(value)
+
+
+class FakeConfig(object):
+    def __init__(self):
+        self.cache = FakeCache()
+
+
+class CountingParser(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, content):
+        self.calls += 1
+        return TomlChaosFile.parse(content)
+
+
+SCENARIO = """
+entry-point="fake_app_success.factory"
+next-point="fake_app_success.process_data"
+[[act]]
+[[act."fake_app_success.get_data"]]
+exc="KeyError"
+"""
+
+
+def test_unchanged_file_is_not_parsed_again(tmpdir):
+    f = tmpdir.join("chaos_cached.toml")
+    f.write(SCENARIO)
+    config, parse = FakeConfig(), CountingParser()
+
+    first = load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    second = load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    assert parse.calls == 1
+    assert first == second
+    assert second["entry-point"] == "fake_app_success.factory"
+    assert len(second["acts"]) == 1
+
+
+def test_touched_file_with_same_content_uses_hash(tmpdir):
+    f = tmpdir.join("chaos_cached.toml")
+    f.write(SCENARIO)
+    config, parse = FakeConfig(), CountingParser()
+
+    load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    os.utime(str(f), (1, 1))
+    load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    assert parse.calls == 1
+
+
+def test_changed_file_is_compiled_again(tmpdir):
+    f = tmpdir.join("chaos_cached.toml")
+    f.write(SCENARIO)
+    config, parse = FakeConfig(), CountingParser()
+
+    load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    f.write(SCENARIO + """
+[[act]]
+[[act."fake_app_success.get_data"]]
+exc="OSError"
+""")
+    os.utime(str(f), (1, 1))
+    compiled = load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    assert parse.calls == 2
+    assert len(compiled["acts"]) == 2
+
+
+def test_invalid_file_is_not_cached(tmpdir):
+    f = tmpdir.join("chaos_cached.toml")
+    f.write("entry-point1=\"factory\"")
+    config = FakeConfig()
+
+    with pytest.raises(AssertionError, match="Define entry point to run chaos testing."):
+        load_scenario(config, f, TomlChaosFile.parse, TomlChaosFile.extract_acts)
+    assert config.cache.data == {}
+
+
+def test_entry_with_other_header_keys_is_compiled_again(tmpdir, monkeypatch):
+    f = tmpdir.join("chaos_cached.toml")
+    f.write(SCENARIO)
+    config, parse = FakeConfig(), CountingParser()
+
+    load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    monkeypatch.setattr("chaos_test.cache.HEADER_KEYS", cache.HEADER_KEYS + ("new-key",))
+    compiled = load_scenario(config, f, parse, TomlChaosFile.extract_acts)
+    assert parse.calls == 2
+    assert "new-key" in compiled
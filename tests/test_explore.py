@@ -0,0 +1,44 @@
+import os
+
+from chaos_test.explore import Explorer, expand, traced_paths
+
+
+def test_pairs_follow_singles():
+    sequences = expand({"targets": ["app.get"], "exceptions": ["KeyError", "ValueError"], "strategy": "pairs"})
+    key, value = ("app.get", "KeyError"), ("app.get", "ValueError")
+    assert sequences == [(key,), (value,), (key, value), (value, key)]
+
+
+def test_random_walks_repeatable():
+    spec = {"targets": ["app.get", "app.put"], "exceptions": ["KeyError"], "strategy": "random",
+            "walks": 5, "length": 4, "seed": 7}
+    sequences = expand(spec)
+    assert sequences == expand(spec)
+    for sequence in sequences:
+        assert len(sequence) == 4
+        assert all(first != second for first, second in zip(sequence, sequence[1:]))
+
+
+def test_prefix_without_new_paths_prunes_longer_sequences():
+    explorer = Explorer()
+    first, second = ("app.get", "KeyError"), ("app.get", "ValueError")
+    explorer.update((first,), [{1, 2}, set()], 1)
+    explorer.update((second,), [{1, 2}, set()], 1)
+    explorer.update((first, second), [{1, 2}, {1, 2}, set()], 2)
+    assert explorer.pruned((first, second)) is None
+    assert explorer.pruned((second, first)) == (second,)
+    assert Explorer(prune=False).pruned((second, first)) is None
+
+
+def test_traced_paths_default_to_entry_point_package(tmpdir, monkeypatch):
+    package = tmpdir.mkdir("traced_pkg")
+    package.join("__init__.py").write("")
+    package.join("app.py").write("def factory():\n    pass\n")
+    tmpdir.join("traced_module.py").write("def factory():\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.chdir(tmpdir)
+
+    assert traced_paths({}, "traced_pkg.app.factory") == (str(package) + os.sep,)
+    assert traced_paths({}, "traced_module.factory") == (str(tmpdir.join("traced_module.py")),)
+    assert traced_paths({"include": ["traced_pkg", "traced_module.py"]}, "traced_pkg.app.factory") == \
+        (str(package) + os.sep, str(tmpdir.join("traced_module.py")))
@@ -0,0 +1,33 @@
+from chaos_test.histogram import BUCKETS, Histogram, HistogramRecorder, bucket_limit, bucket_of
+
+
+def test_buckets_keep_values_within_a_sixteenth():
+    for nanoseconds in (0, 1, 31, 32, 33, 1000, 123456, 10 ** 9, 10 ** 11):
+        index = bucket_of(nanoseconds)
+        assert 0 <= index < BUCKETS
+        assert nanoseconds <= bucket_limit(index) <= nanoseconds + nanoseconds / 16.0 + 1
+    assert bucket_of(2 ** 60) == BUCKETS - 1
+
+
+def test_percentiles():
+    histogram = Histogram()
+    for microseconds in range(1, 1001):
+        histogram.record(microseconds / 1e6)
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert abs(summary["p50"] - 500e-6) <= 500e-6 / 16
+    assert abs(summary["p99"] - 990e-6) <= 990e-6 / 16
+    assert summary["max"] == summary["p999"] or summary["p999"] < summary["max"]
+    assert Histogram().summary()["p50"] is None
+
+
+def test_phases_recorded_apart():
+    recorder = HistogramRecorder(["app.get"])
+    recorder.switch("warm-up")
+    recorder.slots["app.get"].histogram.record(0.001)
+    recorder.switch("act-0")
+    recorder.slots["app.get"].histogram.record(0.002)
+    recorder.slots["app.get"].histogram.record(0.003)
+    assert recorder.summary("warm-up")["app.get"]["count"] == 1
+    assert recorder.summary("act-0")["app.get"]["count"] == 2
+    assert recorder.summary("act-1") is None
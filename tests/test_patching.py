@@ -0,0 +1,83 @@
+from chaos_test.patching import PatchSet
+import types
+
+
+class Base(object):
+    def inherited(self):
+        return "base"
+
+
+class Child(Base):
+    pass
+
+
+def make_module():
+    module = types.ModuleType("patched_module")
+    module.first = lambda: "first"
+    module.second = lambda: "second"
+    return module
+
+
+def test_batch_applied_and_reverted():
+    module = make_module()
+    first, second = module.first, module.second
+    patches = PatchSet()
+    patches.add(module, "first", lambda: "patched first")
+    patches.add(module, "second", lambda: "patched second")
+
+    assert module.first is first and not patches.gate.active
+    patches.apply()
+    assert (module.first(), module.second()) == ("patched first", "patched second")
+    assert patches.gate.active
+    patches.revert()
+    assert module.first is first and module.second is second
+    assert not patches.gate.active
+
+
+def test_inherited_attribute_removed_on_revert():
+    patches = PatchSet()
+    patches.add(Child, "inherited", lambda self: "patched")
+    patches.apply()
+    assert Child().inherited() == "patched"
+    patches.revert()
+    assert "inherited" not in Child.__dict__
+    assert Child().inherited() == "base"
+
+
+def test_patches_of_the_same_target_wrap_each_other():
+    module = make_module()
+    patches = PatchSet()
+    inner = patches.current(module, "first")
+    patches.add(module, "first", lambda: "inner " + inner())
+    outer = patches.current(module, "first")
+    patches.add(module, "first", lambda: "outer " + outer())
+    patches.apply()
+    assert module.first() == "outer inner first"
+    patches.revert()
+    assert module.first() == "first"
+
+
+def test_next_set_prepared_below_the_current_one():
+    module = make_module()
+    current = PatchSet()
+    current.add(module, "first", lambda: "current")
+    current.apply()
+
+    following = PatchSet(below=current)
+    original = following.current(module, "first")
+    following.add(module, "first", lambda: "following " + original())
+    assert module.first() == "current"
+
+    current.revert()
+    following.apply()
+    assert module.first() == "following first"
+
+
+def test_derived_random_streams_are_independent():
+    from chaos_test.structure import derived_random
+    import random
+
+    first, second = derived_random(7, "delay"), derived_random(7, "delay")
+    assert [first.random() for _ in range(5)] == [second.random() for _ in range(5)]
+    delays, triggers = derived_random(7, "delay"), random.Random(7)
+    assert [delays.random() for _ in range(5)] != [triggers.random() for _ in range(5)]
@@ -1,3 +1,5 @@
+import json
+import re
 import pytest
 import sys
 
@@ -105,7 +107,7 @@ def test_errors_multiple_acts_collected_no_next_point(testdir):
     exc="OSError"
     [[act]]
     [[act."fake_app_success.process_data"]]
-    exc="werkzeug.utils.ImportStringError"
+    exc="xml.parsers.expat.ExpatError"
     """)
     # run all tests with pytest
     result = testdir.runpytest()
@@ -140,7 +142,7 @@ def test_errors_not_every_act_has_next_point_first_missing(testdir):
     [[act]]
     "next-point"="fake_app_success.process_data"
     [[act."fake_app_success.process_data"]]
-    exc="werkzeug.utils.ImportStringError"
+    exc="xml.parsers.expat.ExpatError"
     """)
     # run all tests with pytest
     result = testdir.runpytest()
@@ -174,7 +176,7 @@ def test_errors_not_every_act_has_next_point_last_missing(testdir):
     exc="OSError"
     [[act]]
     [[act."fake_app_success.process_data"]]
-    exc="werkzeug.utils.ImportStringError"
+    exc="xml.parsers.expat.ExpatError"
     """)
     # run all tests with pytest
     result = testdir.runpytest()
@@ -233,7 +235,7 @@ def test_fails_act_collected_import_exception_local_next(testdir):
     [[act]]
     next-point="fake_app_success.process_data"
     [[act."fake_app_success.get_data"]]
-    exc="werkzeug.utils.ImportStringError,test1,test2"
+    exc="xml.parsers.expat.ExpatError,test1,test2"
     """)
     # run all tests with pytest
     result = testdir.runpytest()
@@ -329,3 +331,1464 @@ def test_succeeds_many_acts_collected_multiple_builtin_acts(testdir):
     result = testdir.runpytest()
     # check that all 4 tests passed
     result.assert_outcomes(passed=4)
+
+
+def test_succeeds_scenarios_run_concurrently(testdir):
+    """Two scenarios running at the same time only see their own messages."""
+    import threading
+    from chaos_test.structure import TEST_STATUS
+    testdir.copy_example("tests/fake_app_success.py")
+    with open("fake_app_success.py") as f:
+        testdir.makepyfile(other_app=f.read())
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    for app in ["fake_app_success", "other_app"]:
+        f = testdir.tmpdir.join("chaos_{}".format(app)).new(ext="toml")
+        f.write("""entry-point="{app}.factory"
+        next-point="{app}.process_data"
+        [[act]]
+        [[act."{app}.get_data"]]
+        exc="KeyError"
+        [[act]]
+        [[act."{app}.get_data"]]
+        exc="KeyError"
+        """.format(app=app))
+    # Targets are imported when the scenarios run, after the inline session
+    # restored sys.modules - import the apps up front so they stay loaded.
+    testdir.syspathinsert()
+    __import__("fake_app_success")
+    __import__("other_app")
+    items, _ = testdir.inline_genitems()
+    scenarios = []
+    for item in items:
+        if item.scenario not in scenarios:
+            scenarios.append(item.scenario)
+    assert len(scenarios) == 2
+    assert scenarios[0].channel is not scenarios[1].channel
+
+    threads = [threading.Thread(target=s.runtest, args=(s.acts[0].name,)) for s in scenarios]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for scenario in scenarios:
+        assert set(scenario.act_results.values()) == {TEST_STATUS.SUCCESS}
+
+
+def test_isolated_scenarios_run_in_workers(testdir):
+    """Scenarios run in worker processes report the same results."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_success").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    """)
+    f = testdir.tmpdir.join("chaos_failure").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="OSError"
+    """)
+    result = testdir.runpytest("--chaos-isolate", "--chaos-workers=2")
+    result.assert_outcomes(passed=2, failed=1)
+
+
+def test_isolated_worker_crash_is_contained(testdir):
+    """A worker dying mid-act fails its acts without stopping the session."""
+    testdir.makepyfile(crashing_app="""
+    import os
+
+    def get_data():
+        pass
+
+    def process_data():
+        pass
+
+    def main():
+        try:
+            get_data()
+        except KeyError:
+            pass
+        os._exit(3)
+
+    def factory():
+        return main
+    """)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_crash").new(ext="toml")
+    f.write("""entry-point="crashing_app.factory"
+    next-point="crashing_app.process_data"
+    [[act]]
+    [[act."crashing_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."crashing_app.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest("--chaos-isolate")
+    result.assert_outcomes(failed=2)
+    result.stdout.fnmatch_lines(["*Act was not completed.*"])
+
+
+def test_isolated_worker_error_keeps_reported_results():
+    """Acts a worker reported on keep their results when it fails afterwards."""
+    from chaos_test.isolation import WorkerHandle
+    from chaos_test.structure import TEST_STATUS
+
+    handle = WorkerHandle(None, {"acts-names": ["act-0", "act-1"]})
+    handle.results["act-0"] = TEST_STATUS.SUCCESS
+    handle.error = "Traceback (most recent call last):"
+    handle.finished = True
+    assert handle.result("act-0") == TEST_STATUS.SUCCESS
+    with pytest.raises(RuntimeError, match="Chaos worker failed"):
+        handle.result("act-1")
+
+
+def test_fails_act_deadline_expired(testdir):
+    """Act which never reaches its next-point fails once its timeout passes."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    [[act]]
+    timeout=0.5
+    next-point="fake_app_success.unused_method"
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines(["*Deadline expired. Application stack:*", "*in main*"])
+
+
+def test_fails_scenario_deadline_expired(testdir):
+    """Scenario timeout bounds the whole run."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="yml")
+    f.write("""
+    entry-point: fake_app_success.factory
+    next-point: fake_app_success.unused_method
+    timeout: 0.5
+    acts:
+      - fake_app_success.get_data:
+          - exc: KeyError
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*Deadline expired*"])
+
+
+def test_act_targets_not_imported_at_collection(testdir):
+    """Actors are resolved when their act activates, not when the file is collected."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."not_installed_module.get_data"]]
+    exc="not_installed_module.Error"
+    """)
+    result = testdir.runpytest("--collect-only")
+    result.stdout.fnmatch_lines(["*1 test collected*"])
+    assert "not_installed_module" not in result.stdout.str()
+
+
+def test_entry_point_imported_when_scenario_runs(testdir):
+    """The entry point's module is only located at collection, and imported once the scenario runs."""
+    testdir.makepyfile(import_failing_app="""
+    raise RuntimeError("Imported the application")
+    """)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="import_failing_app.factory"
+    next-point="import_failing_app.process_data"
+    [[act]]
+    [[act."import_failing_app.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest("--collect-only")
+    result.stdout.fnmatch_lines(["*1 test collected*"])
+    assert "Imported the application" not in result.stdout.str()
+
+    result = testdir.runpytest()
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*Scenario could not be started*", "*Imported the application*"])
+
+
+PROBABILISTIC_APP = """
+import time
+
+def get_data():
+    pass
+
+def process_data():
+    pass
+
+def main():
+    raised, deadline = 0, time.time() + {duration}
+    calls = 0
+    while time.time() < deadline or calls < {calls}:
+        calls += 1
+        try:
+            get_data()
+        except KeyError:
+            raised += 1
+        time.sleep({pause})
+    if {low} <= raised <= {high}:
+        process_data()
+
+def factory():
+    return main
+"""
+
+
+def test_succeeds_actor_raises_by_chance(testdir):
+    """With chance set only a share of the calls raises."""
+    testdir.makepyfile(chance_app=PROBABILISTIC_APP.format(duration=0, calls=2000, pause=0, low=300, high=500))
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="chance_app.factory"
+    next-point="chance_app.process_data"
+    [[act]]
+    [[act."chance_app.get_data"]]
+    exc="KeyError"
+    chance=20
+    seed=3
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+
+
+def test_succeeds_actor_raises_at_rate(testdir):
+    """With rate set raises are spaced out in time."""
+    testdir.makepyfile(rate_app=PROBABILISTIC_APP.format(duration=0.5, calls=0, pause=0.001, low=2, high=4))
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="yml")
+    f.write("""
+    entry-point: rate_app.factory
+    next-point: rate_app.process_data
+    acts:
+      - rate_app.get_data:
+          - exc: KeyError
+            rate: 5
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+
+
+def test_actor_counters_recorded_in_history(testdir):
+    """Runner reads actors' counters into act history once the act is over."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    [[act."fake_app_success.unused_method"]]
+    exc="KeyError"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    """)
+    testdir.syspathinsert()
+    __import__("fake_app_success")
+    items, _ = testdir.inline_genitems()
+    items[0].runtest()
+    items[1].runtest()
+
+    assert items[0].history == {
+        "fake_app_success.get_data": True,
+        "fake_app_success.unused_method": False,
+        "fake_app_success.process_data": True,
+    }
+    get_data = [actor for actor in items[0].actors if actor.target == "fake_app_success.get_data"][0]
+    assert get_data.stats.calls == get_data.stats.hits == 1
+
+
+def test_dispatch_table_switches_acts(testdir):
+    """With --chaos-dispatch targets are patched once, acts only switch what the trampolines call."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    [[act."fake_app_success.unused_method"]]
+    exc="KeyError"
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("fake_app_success")
+    originals = (app.get_data, app.unused_method, app.process_data)
+    items, _ = testdir.inline_genitems("--chaos-dispatch")
+    items[0].runtest()
+    items[1].runtest()
+
+    assert items[0].scenario.table is not None
+    assert items[0].history == {
+        "fake_app_success.get_data": True,
+        "fake_app_success.unused_method": False,
+        "fake_app_success.process_data": True,
+    }
+    assert items[1].history == {
+        "fake_app_success.get_data": True,
+        "fake_app_success.process_data": True,
+    }
+    assert (app.get_data, app.unused_method, app.process_data) == originals
+
+
+def test_act_metrics_reported(testdir):
+    """Per-act metrics land in the report section and in the JSON report."""
+    testdir.makepyfile(looping_app="""
+    def tick():
+        pass
+
+    def get_data():
+        pass
+
+    def process_data():
+        pass
+
+    def main():
+        iteration = 0
+        while True:
+            iteration += 1
+            tick()
+            try:
+                get_data()
+            except KeyError:
+                pass
+            if iteration % 3 == 0:
+                process_data()
+
+    def factory():
+        return main
+    """)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="looping_app.factory"
+    next-point="looping_app.process_data"
+    iteration-point="looping_app.tick"
+    [[act]]
+    [[act."looping_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."looping_app.get_data"]]
+    exc="KeyError"
+    """)
+    report = testdir.tmpdir.join("report.json")
+    result = testdir.runpytest("-rP", "--chaos-report", str(report))
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(["Act duration: *s", "Iterations: 3 (*/s)", "looping_app.get_data * 3 * 3 *s"])
+
+    scenarios = json.loads(report.read())["scenarios"]
+    assert len(scenarios) == 1
+    first, second = scenarios[0]["acts"]
+    assert first["status"] == second["status"] == "passed"
+    assert first["iterations"] == second["iterations"] == 3
+    assert first["duration"] > 0
+    assert first["targets"]["looping_app.get_data"]["hits"] == 3
+    assert first["targets"]["looping_app.process_data"]["kind"] == "next-point"
+
+
+def test_succeeds_json_scenario(testdir):
+    """JSON scenarios share the YAML schema."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="json")
+    f.write(json.dumps({
+        "entry-point": "fake_app_success.factory",
+        "next-point": "fake_app_success.process_data",
+        "acts": [
+            {"fake_app_success.get_data": [{"exc": "KeyError"}]},
+            {"fake_app_success.get_data": [{"exc": "KeyError"}]},
+        ],
+    }))
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=2)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_succeeds_json_lines_scenario(testdir, stream):
+    """JSON lines scenario - settings first, then an act per line."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="jsonl")
+    f.write("\n".join(json.dumps(line) for line in [
+        {"entry-point": "fake_app_success.factory", "next-point": "fake_app_success.process_data"},
+        {"fake_app_success.get_data": [{"exc": "KeyError"}]},
+        {"fake_app_success.get_data": [{"exc": "KeyError"}], "next-point": "fake_app_success.process_data"},
+        {"fake_app_success.get_data": [{"exc": "KeyError"}]},
+    ]))
+    result = testdir.runpytest(*(["--chaos-stream"] if stream else []))
+    result.assert_outcomes(passed=3)
+
+
+def test_json_without_next_point_fails_collection(testdir):
+    """JSON scenarios are validated like the other formats."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="json")
+    f.write(json.dumps({
+        "entry-point": "fake_app_success.factory",
+        "acts": [{"fake_app_success.get_data": [{"exc": "KeyError"}]}],
+    }))
+    result = testdir.runpytest()
+    if sys.version_info.major < 3:
+        result.assert_outcomes(error=1)
+    else:
+        result.assert_outcomes(errors=1)
+    result.stdout.fnmatch_lines(["*Without global next-point*"])
+
+
+def test_succeeds_registered_format(testdir):
+    """Formats registered with a load function share collection with the built-in ones."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    import json
+    from chaos_test import register_format
+
+    pytest_plugins = ["chaos_test"]
+
+    def load(content):
+        return json.loads(content.decode("utf8"))
+
+    register_format("chaosjson", load, header="steps")
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="chaosjson")
+    f.write(json.dumps({
+        "entry-point": "fake_app_success.factory",
+        "next-point": "fake_app_success.process_data",
+        "steps": [{"fake_app_success.get_data": [{"exc": "KeyError"}]}],
+    }))
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=1)
+
+
+def test_succeeds_streamed_yaml_acts(testdir):
+    """With --chaos-stream acts are loaded from the file only once they are reached."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="yml")
+    f.write("""
+    entry-point: fake_app_success.factory
+    next-point: fake_app_success.process_data
+    acts:
+      - fake_app_success.get_data:
+          - exc: KeyError
+      - fake_app_success.get_data:
+          - exc: KeyError
+      - fake_app_success.get_data:
+          - exc: KeyError
+    """)
+    items, _ = testdir.inline_genitems("--chaos-stream")
+    assert len(items) == 3
+    assert all(item.actors is None for item in items)
+
+    result = testdir.runpytest("--chaos-stream")
+    result.assert_outcomes(passed=3)
+
+    # Acts that are over keep only their metrics.
+    reprec = testdir.inline_run("--chaos-stream")
+    reprec.assertoutcome(passed=3)
+    items = reprec.getcall("pytest_collection_finish").session.items
+    assert all(item.actors is None and item.patches is None and item.metrics for item in items)
+
+
+POOL_APP = """
+FAILED = []
+
+
+class Connection(object):
+    def __init__(self, name):
+        self.name = name
+
+    def query(self):
+        return "rows"
+
+    @property
+    def healthy(self):
+        return True
+
+    @staticmethod
+    def version():
+        return 1
+
+    @classmethod
+    def create(cls, name):
+        return cls(name)
+
+
+def is_flaky(connection):
+    return connection.name.endswith("3")
+
+
+def process_data():
+    pass
+
+
+def main():
+    pool = [Connection.create("conn-{}".format(i)) for i in range(10)]
+    while True:
+        failed = set()
+        for connection in pool:
+            try:
+                connection.query()
+                if not connection.healthy:
+                    failed.add(connection.name)
+            except KeyError:
+                failed.add(connection.name)
+        try:
+            Connection.version()
+        except ValueError:
+            failed.add("version")
+        try:
+            Connection.create("conn-x")
+        except ValueError:
+            failed.add("create")
+        if failed:
+            FAILED.append(sorted(failed))
+            process_data()
+
+
+def factory():
+    return main
+"""
+
+
+@pytest.mark.parametrize("options", [[], ["--chaos-dispatch"]])
+def test_descriptors_and_instance_filters(testdir, options):
+    """Methods, properties, static and class methods are patched in place, filters pick instances."""
+    testdir.makepyfile(pool_app=POOL_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="pool_app.factory"
+    next-point="pool_app.process_data"
+    [[act]]
+    [[act."pool_app.Connection.query"]]
+    exc="KeyError"
+    where={name="conn-7"}
+    [[act]]
+    [[act."pool_app.Connection.healthy"]]
+    delay=0
+    call-original=false
+    instance-filter="pool_app.is_flaky"
+    [[act]]
+    [[act."pool_app.Connection.version"]]
+    exc="ValueError"
+    [[act]]
+    [[act."pool_app.Connection.create"]]
+    exc="ValueError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("pool_app")
+    query = app.Connection.__dict__["query"]
+    items, _ = testdir.inline_genitems(*options)
+    for item in items:
+        item.runtest()
+
+    assert app.FAILED == [["conn-7"], ["conn-3"], ["version"], ["create"]]
+    query_actor = items[0].actors[0]
+    assert query_actor.stats.calls == query_actor.stats.hits == 1
+    assert app.Connection.__dict__["query"] is query
+    assert isinstance(app.Connection.__dict__["version"], staticmethod)
+    assert isinstance(app.Connection.__dict__["healthy"], property)
+
+
+DELAYED_APP = """
+import time
+
+def get_data():
+    return "data"
+
+def process_data():
+    pass
+
+def main():
+    while True:
+        start = time.time()
+        result = get_data()
+        if time.time() - start >= {minimum} and result == {expected!r}:
+            process_data()
+
+def factory():
+    return main
+"""
+
+
+def test_succeeds_fixed_delay_calls_original(testdir):
+    """Delay actor sleeps and then runs the original, reporting injected latency."""
+    testdir.makepyfile(delayed_app=DELAYED_APP.format(minimum=0.1, expected="data"))
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="delayed_app.factory"
+    next-point="delayed_app.process_data"
+    [[act]]
+    [[act."delayed_app.get_data"]]
+    delay=0.1
+    """)
+    result = testdir.runpytest("-rP")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*Injected latency*", "delayed_app.get_data: 0.1??s added over 1 delayed calls*"])
+
+
+def test_succeeds_distributed_delay_without_original(testdir):
+    """Delay sampled from a distribution, original method is not called."""
+    testdir.makepyfile(delayed_app=DELAYED_APP.format(minimum=0.05, expected=None))
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="yml")
+    f.write("""
+    entry-point: delayed_app.factory
+    next-point: delayed_app.process_data
+    acts:
+      - delayed_app.get_data:
+          - delay:
+              distribution: uniform
+              low: 0.05
+              high: 0.1
+            call-original: false
+            seed: 1
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=1)
+
+
+ASYNC_APP = """
+import asyncio
+
+async def get_data():
+    return "data"
+
+async def process_data():
+    pass
+
+async def background(calls):
+    while True:
+        try:
+            await get_data()
+        except KeyError:
+            pass
+        calls.append(None)
+        await asyncio.sleep(0)
+
+async def main():
+    calls = []
+    tasks = [asyncio.ensure_future(background(calls)) for _ in range(100)]
+    while True:
+        coroutine = get_data()
+        if not asyncio.iscoroutine(coroutine):
+            return
+        try:
+            await coroutine
+        except KeyError:
+            pass
+        if calls:
+            await process_data()
+        await asyncio.sleep(0.001)
+
+def factory():
+    return main
+"""
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio coroutines need Python 3.5+")
+@pytest.mark.parametrize("options", [[], ["--chaos-dispatch"]])
+def test_succeeds_coroutine_entry_point_and_targets(testdir, options):
+    """Coroutine app runs on its own loop, coroutine targets stay coroutines."""
+    testdir.makepyfile(async_app=ASYNC_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="async_app.factory"
+    next-point="async_app.process_data"
+    timeout=10
+    [[act]]
+    [[act."async_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."async_app.get_data"]]
+    delay=0.01
+    [[act]]
+    [[act."async_app.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest(*options)
+    result.assert_outcomes(passed=3)
+
+
+EXPLORED_APP = """
+HANDLED = []
+
+
+def get_data():
+    return "data"
+
+
+def process_data():
+    pass
+
+
+def main():
+    while True:
+        try:
+            get_data()
+        except (KeyError, ValueError):
+            HANDLED.append("lookup")
+        except IndexError:
+            HANDLED.append("index")
+        process_data()
+
+
+def factory():
+    return main
+"""
+
+
+def test_generated_sequences_pruned(testdir):
+    """Sequences starting with a fault that reached no new code are skipped."""
+    testdir.makepyfile(explored_app=EXPLORED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="explored_app.factory"
+    next-point="explored_app.process_data"
+    [generate]
+    targets=["explored_app.get_data"]
+    exceptions=["KeyError", "ValueError", "IndexError"]
+    strategy="pairs"
+    """)
+    result = testdir.runpytest("-rs")
+    # ValueError takes the same path as KeyError - pairs starting with it are pruned.
+    result.assert_outcomes(passed=11, skipped=4)
+    result.stdout.fnmatch_lines(["*Pruned - explored_app.get_data:ValueError reached no new code.*"])
+
+
+RECOVERING_APP = """
+import time
+
+def get_data():
+    return "data"
+
+def tick():
+    pass
+
+def process_data():
+    pass
+
+def main():
+    while True:
+        tick()
+        try:
+            get_data()
+        except KeyError:
+            time.sleep(0.05)
+        process_data()
+
+def factory():
+    return main
+"""
+
+
+def test_act_budgets(testdir):
+    """Acts recovering slower than max-recovery-ms or below min-throughput fail with the measured numbers."""
+    testdir.makepyfile(recovering_app=RECOVERING_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="recovering_app.factory"
+    next-point="recovering_app.process_data"
+    iteration-point="recovering_app.tick"
+    [[act]]
+    max-recovery-ms=5
+    [[act."recovering_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    max-recovery-ms=5000
+    [[act."recovering_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    min-throughput=1000000
+    [[act."recovering_app.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest("-rP")
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines([
+        "*Recovery took *ms, max-recovery-ms is 5.*",
+        "*Recovery: *ms*",
+        "*Throughput was *, min-throughput is 1e+06.*",
+    ])
+
+
+LOADED_APP = """
+import asyncio
+import time
+
+ERRORS = []
+
+
+def get_data():
+    return "data"
+
+
+def handle():
+    try:
+        return get_data()
+    except KeyError:
+        ERRORS.append(time.time())
+        raise
+
+
+async def handle_async():
+    await asyncio.sleep(0)
+    return handle()
+
+
+def process_data():
+    pass
+
+
+def main():
+    while True:
+        time.sleep(0.01)
+        if ERRORS:
+            del ERRORS[:]
+            process_data()
+
+
+def factory():
+    return main
+"""
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio coroutines need Python 3.5+")
+@pytest.mark.parametrize("load", ['{target="loaded_app.handle", concurrency=4}',
+                                  '{target="loaded_app.handle", rate=500}',
+                                  '{target="loaded_app.handle_async", concurrency=2}'])
+def test_load_drives_request_based_app(testdir, load):
+    """Load workers call the target for the whole scenario, counted per act."""
+    testdir.makepyfile(loaded_app=LOADED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="loaded_app.factory"
+    next-point="loaded_app.process_data"
+    load={}
+    [[act]]
+    [[act."loaded_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."loaded_app.get_data"]]
+    exc="KeyError"
+    """.format(load))
+    result = testdir.runpytest("-rP")
+    result.assert_outcomes(passed=2)
+    output = result.stdout.str()
+    assert len(re.findall(r"Load: \d+ requests, [1-9]\d* errors", output)) == 2
+    assert len(re.findall(r"Load latency: p50 .*ms, p90 .*ms, p99 .*ms, max .*ms", output)) == 2
+
+
+LOAD_DRIVEN_APP = """
+import time
+
+
+def get_data():
+    return "data"
+
+
+def process_data():
+    pass
+
+
+def never_called():
+    pass
+
+
+def handle():
+    try:
+        get_data()
+    except KeyError:
+        pass
+    process_data()
+
+
+def main():
+    while True:
+        time.sleep(0.01)
+        process_data()
+
+
+def factory():
+    return main
+"""
+
+
+def test_load_workers_reaching_next_point(testdir):
+    """Load workers reaching the next-point of the same act advance the scenario only once."""
+    testdir.makepyfile(load_driven_app=LOAD_DRIVEN_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="load_driven_app.factory"
+    next-point="load_driven_app.process_data"
+    load={target="load_driven_app.handle", concurrency=4}
+    [[act]]
+    [[act."load_driven_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    timeout=0.3
+    next-point="load_driven_app.never_called"
+    [[act."load_driven_app.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest()
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*Deadline expired*"])
+
+
+def test_latency_histograms(testdir):
+    """Listed targets are timed during the warm-up and every act, percentiles land in the report."""
+    testdir.makepyfile(recovering_app=RECOVERING_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="recovering_app.factory"
+    next-point="recovering_app.process_data"
+    warm-up=0.1
+    histograms=["recovering_app.tick", "recovering_app.process_data"]
+    [[act]]
+    [[act."recovering_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."recovering_app.get_data"]]
+    exc="KeyError"
+    """)
+    report = testdir.tmpdir.join("report.json")
+    result = testdir.runpytest("-rP", "--chaos-report", str(report))
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines([
+        "latency*calls*p50*p99*p999*max",
+        "recovering_app.process_data*ms",
+        "  warm-up*",
+        "recovering_app.tick*ms",
+    ])
+    acts = json.loads(report.read())["scenarios"][0]["acts"]
+    for act in acts:
+        # The application loops freely while there's no chaos.
+        assert act["warm-up"]["recovering_app.tick"]["count"] > 1
+    # The first act may be activated anywhere in the loop, the second one starts
+    # once the app leaves the next-point - its loop always ticks first.
+    assert acts[1]["histograms"]["recovering_app.tick"]["count"] >= 1
+    # The next-point's original runs once the act is over.
+    assert acts[1]["histograms"]["recovering_app.process_data"]["count"] == 1
+
+
+MEASURED_APP = """
+def get_data():
+    return "data"
+
+def tick():
+    pass
+
+def process_data():
+    pass
+
+def main():
+    count = 0
+    while True:
+        tick()
+        try:
+            get_data()
+        except KeyError:
+            pass
+        count += 1
+        if count % 200 == 0:
+            process_data()
+
+def factory():
+    return main
+"""
+
+
+@pytest.mark.parametrize("baseline", ["{duration=0.05, iterations=3}", "{calls=50, iterations=3}"])
+def test_acts_compared_with_baseline(testdir, baseline):
+    """With --chaos-baseline acts report throughput and latency as ratios of the unpatched application."""
+    testdir.makepyfile(measured_app=MEASURED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="measured_app.factory"
+    next-point="measured_app.process_data"
+    iteration-point="measured_app.tick"
+    warm-up=0.02
+    histograms=["measured_app.get_data"]
+    baseline={}
+    [[act]]
+    [[act."measured_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    [[act."measured_app.get_data"]]
+    delay=0.001
+    """.format(baseline))
+    report = testdir.tmpdir.join("report.json")
+    result = testdir.runpytest("-rP", "--chaos-baseline", "--chaos-report", str(report))
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines([
+        "Compared with baseline (3 windows)",
+        "throughput: *x of */s",
+        "measured_app.get_data latency: p50 *x, p99 *x",
+    ])
+    acts = json.loads(report.read())["scenarios"][0]["acts"]
+    # The first act may be activated right before the next-point, the second one
+    # runs a whole loop. Delayed calls slow it down - way below what the app does
+    # without chaos.
+    assert acts[1]["ratios"]["throughput"] < 0.5
+    assert acts[1]["ratios"]["latency"]["measured_app.get_data"]["p50"] is not None
+
+    result = testdir.runpytest("-rP")
+    result.assert_outcomes(passed=2)
+    assert "Compared with baseline" not in result.stdout.str()
+
+
+def test_baseline_bounded_by_scenario_timeout(testdir):
+    """A baseline window waiting for next-point calls fails the scenario once its timeout passes."""
+    testdir.copy_example("tests/fake_app_success.py")
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="fake_app_success.factory"
+    next-point="fake_app_success.process_data"
+    timeout=0.3
+    baseline={calls=50}
+    [[act]]
+    [[act."fake_app_success.get_data"]]
+    exc="KeyError"
+    """)
+    result = testdir.runpytest("--chaos-baseline")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*Baseline window baseline-0 did not finish before the scenario timeout.*"])
+
+
+SLOWING_APP = """
+import os
+import time
+
+def get_data():
+    return "data"
+
+def process_data():
+    pass
+
+def main():
+    while True:
+        try:
+            get_data()
+        except KeyError:
+            time.sleep(float(os.environ["CHAOS_RECOVERY_SLEEP"]))
+        process_data()
+
+def factory():
+    return main
+"""
+
+
+def test_recovery_compared_with_history(testdir, monkeypatch):
+    """Acts' metrics are kept across sessions, --chaos-compare flags acts recovering slower than before."""
+    testdir.makepyfile(slowing_app=SLOWING_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="slowing_app.factory"
+    next-point="slowing_app.process_data"
+    [[act]]
+    [[act."slowing_app.get_data"]]
+    exc="KeyError"
+    """)
+
+    # Long enough for scheduling noise to stay below MIN_SLOWDOWN.
+    monkeypatch.setenv("CHAOS_RECOVERY_SLEEP", "0.05")
+    for _ in range(5):
+        testdir.runpytest().assert_outcomes(passed=1)
+    result = testdir.runpytest("--chaos-compare")
+    result.stdout.fnmatch_lines(["*chaos regressions*", "No act recovered slower than in its history."])
+
+    monkeypatch.setenv("CHAOS_RECOVERY_SLEEP", "0.5")
+    result = testdir.runpytest("--chaos-compare")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        "*chaos regressions*",
+        "chaos_test.toml::act-0: recovery 5*ms, history 5*ms +- *ms over 6 runs",
+    ])
+
+    history = testdir.tmpdir.join(".pytest_cache", "d", "chaos_test", "history.sqlite")
+    assert history.check()
+    result = testdir.runpytest("-p", "no:cacheprovider", "--chaos-compare")
+    assert "chaos regressions" not in result.stdout.str()
+
+
+def test_failed_start_restores_instrumentation(testdir):
+    """An act that can't be activated fails, and leaves no wrapper behind."""
+    testdir.makepyfile(recovering_app=RECOVERING_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="recovering_app.factory"
+    next-point="recovering_app.process_data"
+    iteration-point="recovering_app.tick"
+    [[act]]
+    [[act."recovering_app.get_data"]]
+    exc="recovering_app.MissingError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("recovering_app")
+    tick = app.tick
+    items, _ = testdir.inline_genitems()
+    with pytest.raises(AssertionError, match="Scenario could not be started"):
+        items[0].runtest()
+    assert app.tick is tick
+
+
+WARMED_APP = """
+import time
+
+RUNNING = []
+
+
+def tick():
+    pass
+
+
+def process_data():
+    pass
+
+
+def unused_method():
+    pass
+
+
+def main():
+    RUNNING.append(True)
+    try:
+        while True:
+            time.sleep(0.001)
+            tick()
+            process_data()
+    finally:
+        RUNNING.remove(True)
+
+
+def factory():
+    return main
+"""
+
+
+def test_failed_start_after_warm_up_stops_app(testdir):
+    """The application started for the warm-up exits when the first act can't be activated."""
+    testdir.makepyfile(warmed_app=WARMED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="warmed_app.factory"
+    next-point="warmed_app.process_data"
+    warm-up=0.05
+    histograms=["warmed_app.tick"]
+    [[act]]
+    [[act."warmed_app.tick"]]
+    exc="warmed_app.MissingError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("warmed_app")
+    tick, process_data = app.tick, app.process_data
+    items, _ = testdir.inline_genitems()
+    with pytest.raises(AssertionError, match="Scenario could not be started"):
+        items[0].runtest()
+    assert app.tick is tick and app.process_data is process_data
+    assert not app.RUNNING
+
+
+def test_expired_deadline_stops_app(testdir):
+    """The application exits once a deadline expired instead of running on unpatched."""
+    testdir.makepyfile(warmed_app=WARMED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="warmed_app.factory"
+    next-point="warmed_app.process_data"
+    [[act]]
+    timeout=0.2
+    next-point="warmed_app.unused_method"
+    [[act."warmed_app.tick"]]
+    delay=0.001
+    """)
+    testdir.syspathinsert()
+    app = __import__("warmed_app")
+    items, _ = testdir.inline_genitems()
+    with pytest.raises(AssertionError, match="Deadline expired"):
+        items[0].runtest()
+    assert not app.RUNNING
+
+
+THREADED_APP = """
+import threading
+import time
+
+RUNNING = []
+
+
+def get_data():
+    return "data"
+
+
+def process_data():
+    pass
+
+
+def never_called():
+    pass
+
+
+def work():
+    while RUNNING:
+        try:
+            get_data()
+        except KeyError:
+            pass
+        process_data()
+        time.sleep(0.001)
+
+
+def main():
+    RUNNING.append(True)
+    for _ in range(3):
+        worker = threading.Thread(target=work)
+        worker.daemon = True
+        worker.start()
+    try:
+        work()
+    finally:
+        del RUNNING[:]
+
+
+def factory():
+    return main
+"""
+
+
+def test_next_point_reached_by_several_threads(testdir):
+    """Threads reaching the next-point of the same act advance the scenario only once."""
+    testdir.makepyfile(threaded_app=THREADED_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="threaded_app.factory"
+    next-point="threaded_app.process_data"
+    [[act]]
+    [[act."threaded_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    timeout=0.3
+    next-point="threaded_app.never_called"
+    [[act."threaded_app.get_data"]]
+    exc="KeyError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("threaded_app")
+    items, _ = testdir.inline_genitems()
+    items[0].runtest()
+    with pytest.raises(AssertionError, match="Deadline expired"):
+        items[1].runtest()
+    assert not app.RUNNING
+
+
+CONCURRENT_ASYNC_APP = """
+import asyncio
+
+RUNNING = []
+
+
+async def get_data():
+    return "data"
+
+
+async def process_data():
+    pass
+
+
+async def never_called():
+    pass
+
+
+async def work():
+    while RUNNING:
+        try:
+            await get_data()
+        except KeyError:
+            pass
+        await process_data()
+        await asyncio.sleep(0.001)
+
+
+async def main():
+    RUNNING.append(True)
+    try:
+        await asyncio.gather(*[work() for _ in range(500)])
+    finally:
+        del RUNNING[:]
+
+
+def factory():
+    return main
+"""
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio coroutines need Python 3.5+")
+def test_next_point_reached_by_many_tasks(testdir):
+    """Tasks awaiting the next-point of the same act advance the scenario only once."""
+    testdir.makepyfile(concurrent_async_app=CONCURRENT_ASYNC_APP)
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    f = testdir.tmpdir.join("chaos_test").new(ext="toml")
+    f.write("""entry-point="concurrent_async_app.factory"
+    next-point="concurrent_async_app.process_data"
+    [[act]]
+    [[act."concurrent_async_app.get_data"]]
+    exc="KeyError"
+    [[act]]
+    timeout=0.3
+    next-point="concurrent_async_app.never_called"
+    [[act."concurrent_async_app.get_data"]]
+    exc="KeyError"
+    """)
+    testdir.syspathinsert()
+    app = __import__("concurrent_async_app")
+    items, _ = testdir.inline_genitems()
+    items[0].runtest()
+    with pytest.raises(AssertionError, match="Deadline expired"):
+        items[1].runtest()
+    assert not app.RUNNING
+
+
+def test_no_history_without_chaos_acts(testdir):
+    """Sessions without chaos acts leave no history database behind."""
+    testdir.makeconftest("""
+    pytest_plugins = ["chaos_test"]
+    """)
+    testdir.makepyfile("""
+    def test_plain():
+        pass
+    """)
+    result = testdir.runpytest("--chaos-compare")
+    result.assert_outcomes(passed=1)
+    assert "chaos regressions" not in result.stdout.str()
+    assert not testdir.tmpdir.join(".pytest_cache", "d", "chaos_test").check()
+
+
+@pytest.mark.parametrize("module", ["yaml", "asyncio"])
+def test_optional_modules_not_imported_with_plugin(module):
+    """Loading the plugin doesn't import modules only some scenarios need."""
+    import subprocess
+    output = subprocess.check_output([
+        sys.executable, "-c",
+        "import sys, chaos_test.hooks; print({!r} in sys.modules)".format(module)])
+    assert output.strip() == b"False"
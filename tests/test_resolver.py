@@ -0,0 +1,47 @@
+from chaos_test.resolver import resolve, LRUCache
+from chaos_test.exceptions import ResolutionError
+import collections
+import os.path
+import sys
+import pytest
+
+
+def test_resolves_attributes_and_builtins():
+    assert resolve("os.path.join") is os.path.join
+    assert resolve("KeyError") is KeyError
+    assert resolve("collections.OrderedDict.fromkeys") == collections.OrderedDict.fromkeys
+
+
+def test_unknown_path_raises():
+    with pytest.raises(ResolutionError):
+        resolve("not_a_builtin_name")
+    with pytest.raises(ResolutionError, match="os.path has no attribute not_there"):
+        resolve("os.path.not_there")
+
+
+def test_broken_module_is_not_reported_as_missing(testdir):
+    testdir.syspathinsert()
+    testdir.makepyfile(broken_app="import not_installed_dependency\n")
+    with pytest.raises(ResolutionError, match="not_installed_dependency"):
+        resolve("broken_app.target")
+
+
+def test_reloaded_module_is_resolved_again(testdir):
+    testdir.syspathinsert()
+    testdir.makepyfile(reloaded_app="def target():\n    pass\n")
+    first = resolve("reloaded_app.target")
+    assert resolve("reloaded_app.target") is first
+
+    del sys.modules["reloaded_app"]
+    assert resolve("reloaded_app.target") is not first
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
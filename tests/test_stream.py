@@ -0,0 +1,66 @@
+from chaos_test.stream import compile_lines, compile_stream
+import json
+import pytest
+import yaml
+
+
+SCENARIO = """
+entry-point: fake_app_success.factory
+next-point: fake_app_success.process_data
+timeout: 5
+acts:
+  - fake_app_success.get_data:
+      - exc: KeyError
+        message: "first: act"
+  - {fake_app_success.get_data: [{exc: ValueError}], next-point: fake_app_success.unused_method}
+  -
+    fake_app_success.get_data:
+      - delay: 0.1
+    timeout: 1
+"""
+
+
+def test_acts_loaded_from_their_fragments(tmpdir):
+    path = tmpdir.join("chaos_stream.yml")
+    path.write(SCENARIO)
+    compiled = compile_stream(path)
+
+    assert compiled["entry-point"] == "fake_app_success.factory"
+    assert compiled["next-point"] == "fake_app_success.process_data"
+    assert compiled["timeout"] == 5
+    assert [act.load() for act in compiled["acts"]] == yaml.safe_load(SCENARIO)["acts"]
+
+
+def test_aliases_rejected(tmpdir):
+    path = tmpdir.join("chaos_stream.yml")
+    path.write("""
+    entry-point: fake_app_success.factory
+    acts:
+      - &act
+        fake_app_success.get_data:
+          - exc: KeyError
+      - *act
+    """)
+    with pytest.raises(AssertionError, match="Anchors and aliases"):
+        compile_stream(path)
+
+
+def test_entry_point_required(tmpdir):
+    path = tmpdir.join("chaos_stream.yml")
+    path.write("acts: []\n")
+    with pytest.raises(AssertionError, match="Define entry point"):
+        compile_stream(path)
+
+
+def test_json_lines_acts_loaded_by_offset(tmpdir):
+    acts = [
+        {"fake_app_success.get_data": [{"exc": "KeyError"}]},
+        {"fake_app_success.get_data": [{"delay": 0.1}], "timeout": 1},
+    ]
+    path = tmpdir.join("chaos_stream.jsonl")
+    path.write("\n".join(json.dumps(line) for line in [{"entry-point": "fake_app_success.factory"}] + acts))
+    compiled = compile_lines(path, json.loads)
+
+    assert compiled["entry-point"] == "fake_app_success.factory"
+    assert compiled["next-point"] is None
+    assert [act.load() for act in compiled["acts"]] == acts
@@ -2,7 +2,7 @@ from chaos_test import TomlChaosFile
 import tempfile
 import pytest
 import toml
-from werkzeug.utils import ImportStringError
+from chaos_test.exceptions import ResolutionError
 
 
 def get_temp_file(content):
@@ -35,7 +35,7 @@ def test_entry_point_detected(_pytest):
     else:
         plugin = TomlChaosFile(f.name, _pytest.request.node)
 
-    with pytest.raises(ImportStringError):
+    with pytest.raises(ResolutionError):
         plugin.collect()
     f.close()
 
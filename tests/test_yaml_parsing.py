@@ -2,7 +2,7 @@ from chaos_test import YamlChaosFile
 import tempfile
 import pytest
 import yaml
-from werkzeug.utils import ImportStringError
+from chaos_test.exceptions import ResolutionError
 
 def get_temp_file(content):
     f = tempfile.NamedTemporaryFile("w")
@@ -35,7 +35,7 @@ def test_entry_point_detected(_pytest):
     else:
         plugin = YamlChaosFile(f.name, _pytest.request.node)
 
-    with pytest.raises(ImportStringError):
+    with pytest.raises(ResolutionError):
         plugin.collect()
     f.close()
 